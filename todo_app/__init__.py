@@ -0,0 +1 @@
+default_app_config = 'todo_app.apps.TodoAppConfig'
@@ -0,0 +1,68 @@
+from django.db.models import OuterRef, Subquery
+from django.http import Http404
+from django.utils.functional import cached_property
+
+from .models import Todo, GroupUser
+
+
+ACTIVE_STATUSES = ('C', 'M')
+
+
+class Access:
+    """
+    Answers what the user of a request may read and edit, see access_for().
+
+    Group members read and edit the group todos, authors their own todos, invited users see nothing
+    of a group yet. A refused check raises Http404 like get_object_or_404.
+    """
+    def __init__(self, user):
+        self.user = user
+
+    @cached_property
+    def memberships(self):
+        """
+        GroupUser rows of the user by group id, with their groups, loaded once per request.
+        """
+        return {membership.group_id: membership
+                for membership in GroupUser.objects.filter(user=self.user, group__deleted_at__isnull=True)
+                .select_related('group')}
+
+    def active_memberships(self):
+        return [membership for membership in self.memberships.values() if membership.status in ACTIVE_STATUSES]
+
+    def group(self, group_id, statuses=ACTIVE_STATUSES):
+        """
+        Returns the user's membership in the group, with the group.
+        """
+        membership = self.memberships.get(group_id)
+        if membership is None or membership.status not in statuses:
+            raise Http404('No such group')
+        return membership
+
+    def todo(self, todo_pk, model=Todo):
+        """
+        Returns the todo with its group if the user may read and edit it, in one query. The todo
+        gets membership_status, the user's status in its group or None.
+        """
+        todos = model.objects.select_related('group').filter(pk=todo_pk)
+        if 'memberships' not in self.__dict__:
+            todos = todos.annotate(membership_status=Subquery(
+                GroupUser.objects.filter(group=OuterRef('group'), user=self.user).values('status')[:1]))
+        todo = todos.first()
+        if todo is None or todo.group is not None and todo.group.deleted_at is not None:
+            raise Http404('No such todo')
+        if 'memberships' in self.__dict__:
+            membership = self.memberships.get(todo.group_id)
+            todo.membership_status = membership.status if membership else None
+        if todo.membership_status not in ACTIVE_STATUSES and todo.user_id != self.user.pk:
+            raise Http404('No such todo')
+        return todo
+
+
+def access_for(request):
+    """
+    Returns the Access of the request user, shared by every check of the request.
+    """
+    if not hasattr(request, '_todo_access'):
+        request._todo_access = Access(request.user)
+    return request._todo_access
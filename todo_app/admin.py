@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Todo, Group, GroupUser
+from .models import Todo, TodoArchive, Group, GroupUser, Job
 
 
 class TodoAdmin(admin.ModelAdmin):
@@ -7,5 +7,14 @@ class TodoAdmin(admin.ModelAdmin):
 
 
 admin.site.register(Todo, TodoAdmin)
+admin.site.register(TodoArchive)
 admin.site.register(Group)
 admin.site.register(GroupUser)
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'status', 'attempts', 'run_at', 'started_at', 'finished_at')
+    list_filter = ('status', 'task')
+
+
+admin.site.register(Job, JobAdmin)
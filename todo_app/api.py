@@ -0,0 +1,165 @@
+import json
+
+from django.conf import settings
+from django.db import transaction
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.http import require_POST
+
+from .caching import invalidate_todo_lists
+from .counters import apply_changes
+from .events import broker, todo_event_data
+from .forms import BulkTodoForm
+from .models import Todo, GroupUser
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400, **details):
+        super().__init__(message)
+        self.status = status
+        self.details = details
+
+
+def _ids(payload, key):
+    ids = payload.get(key, [])
+    if not isinstance(ids, list) or not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids):
+        raise ApiError(f'"{key}" must be a list of ids')
+    return set(ids)
+
+
+def _owned(user, ids, key):
+    """
+    Same check as complete_todo/delete_todo: only the author of a todo may change it.
+    Returns the todos, their groups by id and their counter states by id.
+    """
+    owned = Todo.objects.filter(pk__in=ids, user=user)
+    states = {pk: (group, completion_time, importance) for pk, group, completion_time, importance
+              in owned.values_list('pk', 'group', 'completion_time', 'importance')}
+    missing = sorted(ids - states.keys())
+    if missing:
+        raise ApiError(f'Todos not found in "{key}"', status=404, ids=missing)
+    return owned, {pk: state[0] for pk, state in states.items()}, states
+
+
+def _build_todos(user, items):
+    group_ids = {item['group'] for item in items if isinstance(item, dict) and isinstance(item.get('group'), int)}
+    allowed_groups = set(GroupUser.objects.filter(user=user, group__in=group_ids, status__in=['C', 'M'],
+                                                  group__deleted_at__isnull=True)
+                         .values_list('group', flat=True)) if group_ids else set()
+
+    todos, errors = [], {}
+    for position, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors[position] = 'Todo must be an object'
+            continue
+        form = BulkTodoForm(item)
+        if not form.is_valid():
+            errors[position] = form.errors.get_json_data()
+            continue
+        if item.get('group') is not None and item['group'] not in allowed_groups:
+            errors[position] = 'Group not found'
+            continue
+        todo = form.save(commit=False)
+        todo.user = user
+        todo.group_id = item.get('group')
+        todos.append(todo)
+
+    if errors:
+        raise ApiError('Invalid todos in "create"', errors=errors)
+    return todos
+
+
+def _publish_events(created, changed):
+    """
+    Publishes the group events the model signals would have sent.
+    """
+    events = []
+    reload_groups = set()
+    for todo in created:
+        if todo.group_id is None:
+            continue
+        if todo.pk is None:
+            # Backends without RETURNING give bulk created rows no pk to patch the page with
+            reload_groups.add(todo.group_id)
+        else:
+            events.append((todo.group_id, 'created', todo_event_data(todo)))
+    for event_type, todo_groups in changed:
+        for pk, group_id in todo_groups.items():
+            if group_id is not None:
+                events.append((group_id, event_type, {'id': pk, 'group': group_id}))
+    events.extend((group_id, 'reload', {}) for group_id in reload_groups)
+    if events:
+        broker.publish_many(events)
+
+
+@require_POST
+def bulk_todos(request):
+    """
+    Creates, completes and deletes many todos in one transaction.
+
+    Body: {"create": [{"title": ..., "description": ..., "importance": ..., "group": ...}],
+           "complete": [ids], "delete": [ids]}. Either everything is applied or nothing.
+
+    Clients authenticate with the session of a /login/ POST and, as every POST of the site, send
+    the value of the csrftoken cookie in the X-CSRFToken header. GET /login/ sets the cookie for the
+    login form, the login response replaces it with the one of the session.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Body must be valid JSON'}, status=400)
+
+    try:
+        if not isinstance(payload, dict):
+            raise ApiError('Body must be a JSON object')
+        items = payload.get('create', [])
+        if not isinstance(items, list):
+            raise ApiError('"create" must be a list of todos')
+        to_complete = _ids(payload, 'complete')
+        to_delete = _ids(payload, 'delete')
+        if len(items) + len(to_complete) + len(to_delete) > getattr(settings, 'TODO_API_MAX_BATCH', 1000):
+            raise ApiError('Batch is too large')
+
+        with transaction.atomic():
+            created = Todo.objects.bulk_create(_build_todos(request.user, items))
+            touched_groups = {todo.group_id for todo in created}
+            counted = [(request.user.pk, None, (todo.group_id, None, todo.importance)) for todo in created]
+
+            changed = []
+            completed = 0
+            if to_complete:
+                owned, groups, states = _owned(request.user, to_complete, 'complete')
+                now = timezone.now()
+                # update() skips auto_now, bump the version the cached rows are keyed by
+                completed = owned.filter(completion_time__isnull=True).update(completion_time=now, updated_at=now)
+                touched_groups.update(groups.values())
+                changed.append(('completed', groups))
+                counted.extend((request.user.pk, state, (state[0], now, state[2]))
+                               for state in states.values() if state[1] is None)
+
+            deleted = 0
+            if to_delete:
+                # Read after the completions, a todo completed and deleted here is counted as completed
+                owned, groups, states = _owned(request.user, to_delete, 'delete')
+                # One DELETE without the collector, which would load the rows and send a signal per
+                # todo. Nothing references Todo, the search index drops them by trigger.
+                deleted = owned._raw_delete(owned.db)
+                touched_groups.update(groups.values())
+                changed.append(('deleted', groups))
+                counted.extend((request.user.pk, state, None) for state in states.values())
+
+            apply_changes(counted)
+    except ApiError as error:
+        return JsonResponse({'error': str(error), **error.details}, status=error.status)
+
+    # bulk_create, update and the raw delete send no model signals, the counters were updated above
+    invalidate_todo_lists([request.user.pk], touched_groups)
+    transaction.on_commit(lambda: _publish_events(created, changed))
+
+    response = {'created': len(created), 'completed': completed, 'deleted': deleted}
+    if all(todo.pk is not None for todo in created):
+        response['ids'] = [todo.pk for todo in created]
+    return JsonResponse(response)
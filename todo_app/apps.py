@@ -1,5 +1,19 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
+
+
+def create_search_index(sender, using, **kwargs):
+    from .search import ensure_search_index
+    ensure_search_index(connections[using])
 
 
 class TodoAppConfig(AppConfig):
     name = 'todo_app'
+
+    def ready(self):
+        from . import signals, static  # noqa: F401
+        post_migrate.connect(create_search_index, sender=self)
+        from .sqlite import apply_pragmas
+        connection_created.connect(apply_pragmas)
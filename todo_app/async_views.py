@@ -0,0 +1,103 @@
+"""
+Async versions of the read-heavy views, served by todolist/asgi.py on Django 3.1+.
+
+The read-only context builders and template renders run through sync_to_async with
+thread_sensitive=False, in the default thread pool, so requests are served concurrently. The
+session check and writes stay thread-sensitive, on the one thread that holds their connection.
+The counters created by their first read are the only writes of the builders, they commit on
+their own.
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.db import close_old_connections
+from django.http import HttpResponseBadRequest, HttpResponseNotAllowed
+from django.shortcuts import render
+
+from . import views
+from .access import access_for
+from .conditional import conditional_page
+from .pagination import InvalidCursor
+from .routers import replica_reads
+
+
+def _database_sync_to_async(func):
+    return sync_to_async(func, thread_sensitive=True)
+
+
+def _read_sync_to_async(func):
+    """
+    Runs a read-only function in the thread pool. Pool threads have connections of their own, they
+    are closed after the call as at the end of a request (or kept for CONN_MAX_AGE).
+    """
+    @functools.wraps(func)
+    def read(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(read, thread_sensitive=False)
+
+
+_arender = _read_sync_to_async(render)
+
+
+def async_login_required(view):
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        # request.user is lazy: the session and user are loaded on first access
+        is_authenticated = await _database_sync_to_async(lambda: request.user.is_authenticated)()
+        if not is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+@async_login_required
+@replica_reads
+@conditional_page
+async def current_todos(request):
+    try:
+        context = await _read_sync_to_async(views._current_todos_context)(request)
+    except InvalidCursor:
+        return HttpResponseBadRequest('Bad cursor')
+    return await _arender(request, '../templates/todo_app/current_todos.html', context)
+
+
+@async_login_required
+@replica_reads
+@conditional_page
+async def completed_todos(request):
+    try:
+        context = await _read_sync_to_async(views._completed_todos_context)(request)
+    except InvalidCursor:
+        return HttpResponseBadRequest('Bad cursor')
+    return await _arender(request, '../templates/todo_app/completed_todos.html', context)
+
+
+@async_login_required
+@replica_reads
+@conditional_page
+async def view_todo(request, todo_pk):
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    context = await _read_sync_to_async(views._view_todo_context)(request, todo_pk)
+    return await _arender(request, '../templates/todo_app/view_todo.html', context)
+
+
+@async_login_required
+@replica_reads
+async def groups(request):
+    memberships = await _read_sync_to_async(access_for(request).active_memberships)()
+    return await _arender(request, '../templates/todo_app/groups.html',
+                          {'groups': [membership.group for membership in memberships]})
+
+
+@async_login_required
+async def group(request, group_id):
+    if request.method != 'GET':
+        return await _database_sync_to_async(views.group)(request, group_id)
+    membership = await _read_sync_to_async(access_for(request).group)(group_id)
+    context = await _read_sync_to_async(views._group_context)(request, group_id, membership)
+    return await _arender(request, '../templates/todo_app/group.html', context)
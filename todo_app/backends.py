@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+
+from .caching import cached_user
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend that loads the user of a session from the cache instead of the database.
+
+    The cached user is dropped when the user is saved or deleted (which covers password changes)
+    and on logout. Users changed with QuerySet.update() stay stale until TODO_USER_CACHE_TIMEOUT.
+    Without TODO_SHARED_CACHE it behaves like ModelBackend, other workers would keep their copies.
+    """
+    def get_user(self, user_id):
+        if not getattr(settings, 'TODO_SHARED_CACHE', False):
+            return super().get_user(user_id)
+        return cached_user(user_id, super().get_user)
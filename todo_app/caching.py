@@ -0,0 +1,95 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import GroupUser
+from .routers import reads_from_replica
+
+
+# The validators of the todo pages (todo_app.conditional) go stale with the lists
+LIST_KINDS = ('current', 'completed', 'validators')
+
+
+def private_timeout(timeout):
+    """
+    Caps the timeout of cached data when the cache is private to each process: an invalidation only
+    reaches the cache of the worker that ran it, the others serve their copies until they expire.
+    """
+    if getattr(settings, 'TODO_SHARED_CACHE', False):
+        return timeout
+    return min(timeout, getattr(settings, 'TODO_PRIVATE_CACHE_TIMEOUT', 5))
+
+
+def _timeout():
+    timeout = private_timeout(getattr(settings, 'TODO_LIST_CACHE_TIMEOUT', 300))
+    if reads_from_replica():
+        # Data read from a lagging replica must not outlive the lag
+        timeout = min(timeout, getattr(settings, 'TODO_REPLICA_PIN_SECONDS', 5))
+    return timeout
+
+
+def list_key(kind, user_id):
+    return f'todo_app:lists:{kind}:{user_id}'
+
+
+def cached_lists(kind, user, build):
+    """
+    Returns the assembled list data of the user, building and caching it on a miss.
+    """
+    key = list_key(kind, user.pk)
+    data = cache.get(key)
+    if data is None:
+        data = build(user)
+        cache.set(key, data, _timeout())
+    return data
+
+
+def invalidate_lists(user_ids):
+    cache.delete_many([list_key(kind, user_id) for user_id in set(user_ids) for kind in LIST_KINDS])
+
+
+def invalidate_todo_lists(user_ids, group_ids=()):
+    """
+    Invalidates the lists of todo owners and of every member of the todo groups.
+    """
+    group_ids = {group_id for group_id in group_ids if group_id is not None}
+    member_ids = GroupUser.objects.filter(group__in=group_ids).values_list('user', flat=True) if group_ids else []
+    invalidate_lists([*user_ids, *member_ids])
+
+
+def invites_key(user_id):
+    return f'todo_app:invites:{user_id}'
+
+
+def invites_count(user):
+    key = invites_key(user.pk)
+    count = cache.get(key)
+    if count is None:
+        count = GroupUser.objects.filter(user=user, status='I', group__deleted_at__isnull=True).count()
+        cache.set(key, count, _timeout())
+    return count
+
+
+def invalidate_invites(*user_ids):
+    # The navbar of the todo pages shows the invites
+    cache.delete_many([key for user_id in user_ids for key in (invites_key(user_id), list_key('validators', user_id))])
+
+
+def user_key(user_id):
+    return f'todo_app:user:{user_id}'
+
+
+def cached_user(user_id, load):
+    """
+    Returns the user with the id, loading and caching it on a miss. Missing users are not cached.
+    """
+    key = user_key(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = load(user_id)
+        if user is not None:
+            cache.set(key, user, getattr(settings, 'TODO_USER_CACHE_TIMEOUT', 300))
+    return user
+
+
+def invalidate_user(user_id):
+    cache.delete(user_key(user_id))
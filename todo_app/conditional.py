@@ -0,0 +1,104 @@
+import asyncio
+import functools
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections, router
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from .caching import cached_lists
+from .models import Todo
+
+
+# Everything the todo pages and their navbar show of a user: own and group todos, archived todos,
+# active memberships and invites (group ids summed per status, so joins, leaves and accepts change it)
+VALIDATOR_SQL = '''
+    SELECT todos.count, todos.updated_at, archived.count, archived.archive_time,
+           memberships.count, memberships.active, memberships.invited
+    FROM (SELECT COUNT(*) AS count, MAX(updated_at) AS updated_at FROM todo_app_todo
+          WHERE user_id = %s OR group_id IN (
+              SELECT gu.group_id FROM todo_app_groupuser gu JOIN todo_app_group g ON g.id = gu.group_id
+              WHERE gu.user_id = %s AND gu.status IN ('C', 'M') AND g.deleted_at IS NULL)) todos,
+         (SELECT COUNT(*) AS count, MAX(archive_time) AS archive_time FROM todo_app_todoarchive
+          WHERE user_id = %s) archived,
+         (SELECT COUNT(*) AS count,
+                 SUM(CASE WHEN gu.status = 'I' THEN 0 ELSE gu.group_id END) AS active,
+                 SUM(CASE WHEN gu.status = 'I' THEN gu.group_id ELSE 0 END) AS invited
+          FROM todo_app_groupuser gu JOIN todo_app_group g ON g.id = gu.group_id
+          WHERE gu.user_id = %s AND g.deleted_at IS NULL) memberships'''
+
+
+def _load_state(user):
+    with connections[router.db_for_read(Todo)].cursor() as cursor:
+        cursor.execute(VALIDATOR_SQL, [user.pk] * 4)
+        return cursor.fetchone()
+
+
+def page_validators(request):
+    """
+    Returns the ETag of the request user's todo pages, computed once per request. The state it is
+    made of takes one query. It is cached like the lists only with TODO_SHARED_CACHE, a copy in the
+    cache of one worker would miss the writes handled by the others and answer 304 for a changed page.
+
+    There is no Last-Modified: deletes, membership changes and group deletes leave no timestamp
+    behind, a date would call such pages unchanged.
+    """
+    if not hasattr(request, '_todo_validators'):
+        user = request.user
+        if getattr(settings, 'TODO_SHARED_CACHE', False):
+            row = cached_lists('validators', user, _load_state)
+        else:
+            row = _load_state(user)
+        # Pages carry the CSRF token and differ per query string. get_token() picks the secret a
+        # first visit gets, before the page is rendered.
+        get_token(request)
+        key = repr((user.pk, user.username, request.get_full_path(), request.META['CSRF_COOKIE'], row))
+        request._todo_validators = f'W/"{hashlib.md5(key.encode()).hexdigest()}"'
+    return request._todo_validators
+
+
+def not_modified(request):
+    """
+    Returns a 304 response when the client's copy of the page is current, None otherwise.
+    """
+    return get_conditional_response(request, etag=page_validators(request))
+
+
+def set_validators(request, response):
+    response['ETag'] = page_validators(request)
+    # Personal pages: caches keep them but check back every time
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional_page(view):
+    """
+    Answers GET requests of a todo page with 304 Not Modified, without running the view, while
+    nothing the page shows has changed.
+    """
+    if asyncio.iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await view(request, *args, **kwargs)
+            response = await sync_to_async(not_modified, thread_sensitive=True)(request)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            return set_validators(request, response)
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+        response = not_modified(request)
+        if response is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        return set_validators(request, response)
+    return wrapper
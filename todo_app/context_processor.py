@@ -1,9 +1,51 @@
+from django.utils.functional import SimpleLazyObject, cached_property
+
+from .caching import invites_count
+from .counters import get_counts
 from .models import GroupUser
 
 
+class LazyInvites:
+    """
+    Pending invites of the request user. Nothing is queried until a template touches it,
+    the count comes from the cache and the invites themselves are loaded only if there are any.
+    """
+    def __init__(self, user):
+        self.user = user
+
+    @cached_property
+    def count(self):
+        if not self.user.is_authenticated:
+            return 0
+        return invites_count(self.user)
+
+    @cached_property
+    def items(self):
+        if not self.count:
+            return []
+        return list(GroupUser.objects.filter(user=self.user, status='I', group__deleted_at__isnull=True)
+                    .select_related('group'))
+
+    def __bool__(self):
+        return self.count > 0
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self.items)
+
+
 def invites_processor(request):
-    try:
-        invites = GroupUser.objects.filter(user=request.user, status='I')
-        return {'invites': invites}
-    except TypeError:
-        return {}
\ No newline at end of file
+    if not hasattr(request, 'user'):
+        return {}
+    return {'invites': LazyInvites(request.user)}
+
+
+def counts_processor(request):
+    """
+    Counts of the request user's own todos for the navbar, read from the counters on first use.
+    """
+    if not hasattr(request, 'user'):
+        return {}
+    return {'todo_counts': SimpleLazyObject(lambda: get_counts(user_id=request.user.pk))}
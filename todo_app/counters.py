@@ -0,0 +1,134 @@
+from collections import defaultdict
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import Count, F, Q
+
+from .caching import private_timeout
+from .models import Todo, TodoArchive, TodoCounter
+
+
+FIELDS = ('open', 'completed', 'important')
+
+
+def counts_key(user_id, group_id):
+    return f'todo_app:counts:{user_id}:{group_id}'
+
+
+def _counter_key(user_id, group_id):
+    # A todo counts for its group, or for its author when it is in no group
+    return (None, group_id) if group_id is not None else (user_id, None)
+
+
+def _flags(completion_time, importance):
+    is_open = completion_time is None
+    return {'open': int(is_open), 'completed': int(not is_open), 'important': int(is_open and importance)}
+
+
+def apply_changes(changes):
+    """
+    Updates the counters for changes of (user id, old state, new state) with one UPDATE per counter.
+    A state is (group id, completion_time, importance), or None before creation and after deletion.
+    """
+    deltas = defaultdict(lambda: dict.fromkeys(FIELDS, 0))
+    for user_id, old, new in changes:
+        for state, sign in ((old, -1), (new, 1)):
+            if state is None:
+                continue
+            group_id, completion_time, importance = state
+            delta = deltas[_counter_key(user_id, group_id)]
+            for field, value in _flags(completion_time, importance).items():
+                delta[field] += sign * value
+
+    keys = []
+    for (user_id, group_id), delta in deltas.items():
+        delta = {field: value for field, value in delta.items() if value}
+        if not delta:
+            continue
+        # Counters are created by their first read, until then there is nothing to update
+        TodoCounter.objects.filter(user_id=user_id, group_id=group_id) \
+            .update(**{field: F(field) + value for field, value in delta.items()})
+        keys.append(counts_key(user_id, group_id))
+    if keys:
+        # Evicted again after the commit, a concurrent read may have cached the counts of before it
+        cache.delete_many(keys)
+        transaction.on_commit(partial(cache.delete_many, keys))
+
+
+def count_todos(user_id, group_id, using=None):
+    """
+    Counts the todos of a counter from scratch, archived todos count as completed.
+    """
+    if group_id is not None:
+        todos = Todo.objects.using(using).filter(group=group_id)
+        archived = TodoArchive.objects.using(using).filter(group=group_id)
+    else:
+        todos = Todo.objects.using(using).filter(user=user_id, group=None)
+        archived = TodoArchive.objects.using(using).filter(user=user_id, group=None)
+    counts = todos.aggregate(
+        open=Count('pk', filter=Q(completion_time__isnull=True)),
+        completed=Count('pk', filter=Q(completion_time__isnull=False)),
+        important=Count('pk', filter=Q(completion_time__isnull=True, importance=True)),
+    )
+    counts['completed'] += archived.count()
+    return counts
+
+
+def _create_counter(user_id, group_id):
+    """
+    Counts the todos of a missing counter and stores it. The row is inserted before the count in the
+    same transaction: the insert takes SQLite's write lock, so no todo write can land between the
+    count and the row. Earlier writes are counted, later ones update the row.
+    """
+    counters = TodoCounter.objects.using(DEFAULT_DB_ALIAS)
+    try:
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            counter = counters.create(user_id=user_id, group_id=group_id)
+            counts = count_todos(user_id, group_id, using=DEFAULT_DB_ALIAS)
+            counters.filter(pk=counter.pk).update(**counts)
+    except IntegrityError:
+        # Created by a concurrent request
+        counts = counters.filter(user_id=user_id, group_id=group_id).values(*FIELDS).get()
+    return counts
+
+
+def get_counts(user_id=None, group_id=None):
+    """
+    Returns the counts of a user's own todos or of a group's todos, the counter is created on first use.
+
+    Goes to the default database: counters change in place and a lagging replica would get old
+    values into the cache. Creating a counter is not a write of the user, it doesn't pin the client
+    to the default database either.
+    """
+    key = counts_key(user_id, group_id)
+    counts = cache.get(key)
+    if counts is None:
+        counts = TodoCounter.objects.using(DEFAULT_DB_ALIAS).filter(user_id=user_id, group_id=group_id) \
+            .values(*FIELDS).first()
+        if counts is None:
+            counts = _create_counter(user_id, group_id)
+        cache.set(key, counts, private_timeout(getattr(settings, 'TODO_LIST_CACHE_TIMEOUT', 300)))
+    return counts
+
+
+def reconcile_counters(fix=True):
+    """
+    Recounts every counter and, with fix, corrects the drifted ones. Returns [(counter, stored counts,
+    actual counts)] of the counters that drifted.
+    """
+    drifted = []
+    for counter in TodoCounter.objects.order_by('pk').iterator():
+        with transaction.atomic():
+            expected = count_todos(counter.user_id, counter.group_id)
+            # Lock and reread the row, a write may have changed it since it was listed
+            stored = TodoCounter.objects.select_for_update().filter(pk=counter.pk).values(*FIELDS).first()
+            if stored is None or stored == expected:
+                continue
+            if fix:
+                TodoCounter.objects.filter(pk=counter.pk).update(**expected)
+        if fix:
+            cache.delete(counts_key(counter.user_id, counter.group_id))
+        drifted.append((counter, stored, expected))
+    return drifted
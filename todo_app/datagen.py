@@ -0,0 +1,89 @@
+import random
+from datetime import timedelta
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .counters import apply_changes
+from .models import Todo, TodoArchive, Group, GroupUser
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def generate(users=100, groups=20, members=5, todos=10000, completed=0.7, group_todos=0.3,
+             invited=0.1, seed=0, prefix='gen', password='loadtest', chunk_size=5000):
+    """
+    Bulk inserts synthetic users, groups, memberships and todos. The same seed and prefix always
+    produce the same data. Returns (user ids, group ids).
+    """
+    rnd = random.Random(seed)
+    now = timezone.now()
+
+    # Hashing is slow on purpose, so every generated user shares one hash
+    password_hash = make_password(password)
+    for chunk in _chunks((User(username=f'{prefix}_user{i}', password=password_hash) for i in range(users)),
+                         chunk_size):
+        User.objects.bulk_create(chunk)
+    user_ids = list(User.objects.filter(username__startswith=f'{prefix}_user').order_by('pk')
+                    .values_list('pk', flat=True))
+
+    for chunk in _chunks((Group(name=f'{prefix}_group{i}') for i in range(groups)), chunk_size):
+        Group.objects.bulk_create(chunk)
+    group_ids = list(Group.objects.filter(name__startswith=f'{prefix}_group').order_by('pk')
+                     .values_list('pk', flat=True))
+
+    memberships = {}
+    for group_id in group_ids:
+        for position, user_id in enumerate(rnd.sample(user_ids, min(members, len(user_ids)))):
+            status = 'C' if position == 0 else 'I' if rnd.random() < invited else 'M'
+            memberships[group_id, user_id] = status
+    for chunk in _chunks((GroupUser(group_id=group_id, user_id=user_id, status=status)
+                          for (group_id, user_id), status in memberships.items()), chunk_size):
+        GroupUser.objects.bulk_create(chunk)
+
+    active_members = {}
+    for (group_id, user_id), status in memberships.items():
+        if status != 'I':
+            active_members.setdefault(group_id, []).append(user_id)
+    active_groups = list(active_members)
+
+    def make_todo(pk, i):
+        created = now - timedelta(minutes=rnd.randrange(60 * 24 * 365))
+        if active_groups and rnd.random() < group_todos:
+            group_id = rnd.choice(active_groups)
+            user_id = rnd.choice(active_members[group_id])
+        else:
+            group_id, user_id = None, rnd.choice(user_ids)
+        return Todo(pk=pk, title=f'{prefix} todo {i}', description=f'Generated todo number {i}',
+                    importance=rnd.random() < 0.2, user_id=user_id, group_id=group_id,
+                    creation_time=created,
+                    completion_time=min(now, created + timedelta(minutes=rnd.randrange(1, 60 * 24 * 7)))
+                    if rnd.random() < completed else None)
+
+    # Explicit ids, bulk_update needs them and SQLite returns none from bulk_create. Archived todos
+    # keep their ids, new ones start after both tables.
+    first_pk = max(model.objects.aggregate(last=Max('pk'))['last'] or 0 for model in (Todo, TodoArchive)) + 1
+    for chunk in _chunks((make_todo(first_pk + i, i) for i in range(todos)), chunk_size):
+        creation_times = [todo.creation_time for todo in chunk]
+        with transaction.atomic():
+            Todo.objects.bulk_create(chunk)
+            # auto_now_add stamped now() on the rows, bulk_update writes the generated times without it
+            for todo, creation_time in zip(chunk, creation_times):
+                todo.creation_time = creation_time
+            Todo.objects.bulk_update(chunk, ['creation_time'], batch_size=500)
+            # bulk_create sends no signals, counters read during the run would miss later chunks
+            apply_changes([(todo.user_id, None, (todo.group_id, todo.completion_time, todo.importance))
+                           for todo in chunk])
+
+    return user_ids, group_ids
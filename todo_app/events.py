@@ -0,0 +1,108 @@
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Max, Min
+from django.urls import reverse
+
+from .models import TodoEvent
+
+
+class EventBroker:
+    """
+    Publish/subscribe of todo changes for Server-Sent Events, through the todo_app_todoevent table.
+
+    Events get ids from the table's sequence and the newest history of them are kept, so a
+    reconnecting client can resume from its Last-Event-ID on any worker. Subscribers poll the table
+    every TODO_EVENTS_POLL seconds for events of other processes, events of their own process wake
+    them at once.
+    """
+    def __init__(self, history=1000):
+        self._condition = threading.Condition()
+        self.history = history
+
+    @property
+    def last_id(self):
+        return TodoEvent.objects.aggregate(last=Max('pk'))['last'] or 0
+
+    def publish(self, group_id, event_type, data):
+        self.publish_many([(group_id, event_type, data)])
+
+    def publish_many(self, events):
+        """
+        Stores events of (group id, type, data) with one INSERT and drops those beyond the history.
+        """
+        TodoEvent.objects.bulk_create([TodoEvent(group_id=group_id, event_type=event_type, data=json.dumps(data))
+                                       for group_id, event_type, data in events])
+        TodoEvent.objects.filter(pk__lte=self.last_id - self.history).delete()
+        with self._condition:
+            self._condition.notify_all()
+
+    def wait(self, group_ids, last_id, timeout):
+        """
+        Waits up to timeout seconds for events of the groups newer than last_id. Returns (events,
+        whether some events were already dropped from the history, id of the newest event seen).
+        """
+        deadline = time.monotonic() + timeout
+        poll = getattr(settings, 'TODO_EVENTS_POLL', 1)
+        while True:
+            bounds = TodoEvent.objects.aggregate(first=Min('pk'), last=Max('pk'))
+            newest = bounds['last'] or 0
+            if bounds['first'] is not None and last_id < bounds['first'] - 1:
+                return [], True, newest
+            events = [(event.pk, event.group_id, event.event_type, json.loads(event.data)) for event
+                      in TodoEvent.objects.filter(pk__gt=last_id, pk__lte=newest, group_id__in=group_ids)
+                      .order_by('pk')]
+            remaining = deadline - time.monotonic()
+            if events or remaining <= 0:
+                return events, False, newest
+            with self._condition:
+                self._condition.wait(min(poll, remaining))
+
+
+broker = EventBroker(getattr(settings, 'TODO_EVENTS_HISTORY', 1000))
+
+
+def todo_event_data(todo):
+    return {
+        'id': todo.pk,
+        'group': todo.group_id,
+        'title': todo.title,
+        'description': todo.description,
+        'importance': todo.importance,
+        'url': reverse('view_todo', args=[todo.pk]),
+    }
+
+
+def _format(event_id, event_type, data):
+    return f'id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n'
+
+
+def event_stream(group_ids, last_id):
+    """
+    Yields SSE messages for the groups until TODO_EVENTS_STREAM_TIMEOUT, with a comment line every
+    TODO_EVENTS_HEARTBEAT seconds. The browser reconnects afterwards and resumes via Last-Event-ID.
+    """
+    heartbeat = getattr(settings, 'TODO_EVENTS_HEARTBEAT', 15)
+    deadline = time.monotonic() + getattr(settings, 'TODO_EVENTS_STREAM_TIMEOUT', 300)
+    group_ids = set(group_ids)
+
+    yield 'retry: 3000\n\n'
+    newest = broker.last_id
+    if last_id is None:
+        last_id = newest
+    elif last_id > newest:
+        # The id comes from before the events were cleared
+        last_id = newest
+        yield _format(last_id, 'reload', {})
+    while time.monotonic() < deadline:
+        events, missed, last_id = broker.wait(group_ids, last_id, min(heartbeat, deadline - time.monotonic()))
+        if missed:
+            # Too far behind to patch the page, the client has to reload it
+            yield _format(last_id, 'reload', {})
+            continue
+        for event_id, group_id, event_type, data in events:
+            yield _format(event_id, event_type, data)
+        # Events of other groups were skipped, move the client's Last-Event-ID past them
+        yield f'id: {last_id}\n: heartbeat\n\n'
@@ -1,14 +1,39 @@
-from django.forms import ModelForm
+from django.contrib.auth.forms import UserCreationForm
+from django.forms import ModelForm, DateTimeField, DateTimeInput
 from .models import Todo, Group
 
 
 class TodoForm(ModelForm):
+    # The browser's date and time picker sends 2020-06-26T16:12
+    due_time = DateTimeField(required=False, input_formats=['%Y-%m-%dT%H:%M', '%Y-%m-%d %H:%M'],
+                             widget=DateTimeInput(attrs={'type': 'datetime-local'}, format='%Y-%m-%dT%H:%M'))
+
     class Meta:
         model = Todo
-        fields = ['title', 'description', 'importance', 'group']
+        fields = ['title', 'description', 'importance', 'due_time', 'group']
+
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if user is not None:
+            # Only the groups the user is a member of
+            self.fields['group'].queryset = Group.objects.filter(groupuser__user=user,
+                                                                 groupuser__status__in=['C', 'M'],
+                                                                 deleted_at__isnull=True)
+
+
+class SignupForm(UserCreationForm):
+    class Meta(UserCreationForm.Meta):
+        fields = ('username', 'email')
+        help_texts = {'email': 'Optional. Reminders of due todos are sent there.'}
 
 
 class GroupForm(ModelForm):
     class Meta:
         model = Group
-        fields = ['name', ]
\ No newline at end of file
+        fields = ['name', ]
+
+
+class BulkTodoForm(ModelForm):
+    class Meta:
+        model = Todo
+        fields = ['title', 'description', 'importance']
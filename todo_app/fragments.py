@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+
+def row_key(template_name, todo):
+    return f'todo_app:row:{template_name}:{todo.pk}:{todo.updated_at.timestamp()}'
+
+
+def render_rows(todos, template_name):
+    """
+    Sets row_html on every todo, rendering only the rows missing from the cache.
+
+    Rows are keyed by the todo version (updated_at), so a changed todo never hits a stale row.
+    They must not depend on the current time or user: relative times are rendered by the browser.
+    """
+    keys = {todo.pk: row_key(template_name, todo) for todo in todos}
+    cached = cache.get_many(list(keys.values()))
+    rendered = {}
+    for todo in todos:
+        key = keys[todo.pk]
+        html = cached.get(key)
+        if html is None:
+            html = rendered[key] = render_to_string(template_name, {'todo': todo})
+        todo.row_html = mark_safe(html)
+    if rendered:
+        cache.set_many(rendered, getattr(settings, 'TODO_ROW_CACHE_TIMEOUT', 86400))
+    return todos
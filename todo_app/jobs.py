@@ -0,0 +1,146 @@
+"""
+Background jobs kept in the database: enqueue() stores a job, the run_jobs worker claims and runs it.
+"""
+import json
+import time
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from . import purge
+from .models import Job
+
+
+# Task functions by name, the names are stored in the job rows
+TASKS = {}
+
+
+def task(name):
+    """
+    Registers the decorated function as a task, run with the keyword arguments given to enqueue().
+    """
+    def register(func):
+        TASKS[name] = func
+        return func
+    return register
+
+
+def enqueue(task_name, run_at=None, max_attempts=None, **arguments):
+    """
+    Stores a job running the task with the arguments, which must be JSON serializable, at run_at
+    or as soon as a worker is free.
+    """
+    if task_name not in TASKS:
+        raise ValueError(f'Unknown task {task_name}')
+    return Job.objects.create(task=task_name, arguments=json.dumps(arguments), run_at=run_at or timezone.now(),
+                              max_attempts=max_attempts or getattr(settings, 'TODO_JOB_MAX_ATTEMPTS', 3))
+
+
+def claim(limit, now=None):
+    """
+    Marks up to limit due jobs as running under a new claim token and returns them, oldest first.
+
+    The jobs are taken by one UPDATE that checks their status again: a job another worker claimed
+    in between is skipped, so concurrent workers never get the same job.
+    """
+    now = now or timezone.now()
+    token = uuid.uuid4().hex
+    due = Job.objects.filter(status='Q', run_at__lte=now).order_by('run_at', 'pk').values('pk')[:limit]
+    Job.objects.filter(pk__in=due, status='Q').update(status='R', claim=token, started_at=now, heartbeat_at=now,
+                                                       attempts=F('attempts') + 1)
+    return list(Job.objects.filter(claim=token).order_by('run_at', 'pk'))
+
+
+def heartbeat(tokens, now=None):
+    """
+    Marks the running jobs of the claim tokens alive. A long job is never taken for lost while its
+    worker keeps calling this.
+    """
+    return Job.objects.filter(claim__in=tokens, status='R').update(heartbeat_at=now or timezone.now())
+
+
+def requeue_stale(now=None):
+    """
+    Gives running jobs without a heartbeat for TODO_JOB_TIMEOUT seconds, whose worker died, back to
+    the queue, or fails them when they have no attempts left. Returns the number of jobs touched.
+    """
+    now = now or timezone.now()
+    stale = Job.objects.filter(status='R',
+                               heartbeat_at__lt=now - timedelta(seconds=getattr(settings, 'TODO_JOB_TIMEOUT', 300)))
+    failed = stale.filter(attempts__gte=F('max_attempts')) \
+        .update(status='F', claim='', finished_at=now, last_error='Timed out')
+    return failed + stale.update(status='Q', claim='', run_at=now, last_error='Timed out')
+
+
+def backoff(attempts):
+    """
+    Seconds to wait before the next attempt of a job failed attempts times.
+    """
+    return getattr(settings, 'TODO_JOB_BACKOFF', 30) * 2 ** (attempts - 1)
+
+
+def run_job(pk, token):
+    """
+    Runs a claimed job and records the outcome in its row: done, queued again after backoff() or
+    failed after max_attempts. Returns (task, outcome, run seconds, seconds the job waited) for the
+    worker's metrics, or None when the claim was lost to a timeout.
+    """
+    try:
+        job = Job.objects.get(pk=pk, claim=token, status='R')
+    except Job.DoesNotExist:
+        return None
+    wait = (job.started_at - job.run_at).total_seconds()
+    start = time.perf_counter()
+    try:
+        TASKS[job.task](**json.loads(job.arguments))
+    except Exception:
+        error = traceback.format_exc()
+    else:
+        error = None
+    duration = time.perf_counter() - start
+    now = timezone.now()
+    # Filtering on the token leaves a job alone that was requeued and claimed again meanwhile
+    current = Job.objects.filter(pk=pk, claim=token)
+    if error is None:
+        outcome = 'done'
+        current.update(status='D', claim='', finished_at=now, last_error='')
+    elif job.attempts < job.max_attempts:
+        outcome = 'retry'
+        current.update(status='Q', claim='', run_at=now + timedelta(seconds=backoff(job.attempts)),
+                       last_error=error)
+    else:
+        outcome = 'failed'
+        current.update(status='F', claim='', finished_at=now, last_error=error)
+    return job.task, outcome, duration, max(wait, 0)
+
+
+def run_pooled(pk, token):
+    """
+    run_job() for pool threads and processes, which manage their connections like requests do.
+    """
+    close_old_connections()
+    try:
+        return run_job(pk, token)
+    finally:
+        close_old_connections()
+
+
+@task('purge_group')
+def purge_group(group_id, batch_size=1000):
+    purge.purge_group(group_id, batch_size)
+
+
+@task('archive_todos')
+def archive_todos(days=365, batch_size=500):
+    call_command('archive_todos', days=days, batch_size=batch_size)
+
+
+@task('send_reminders')
+def send_reminders(window=15, batch_size=100):
+    call_command('send_reminders', window=window, batch_size=batch_size)
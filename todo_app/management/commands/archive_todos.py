@@ -0,0 +1,62 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from todo_app.caching import invalidate_lists
+from todo_app.models import Todo, TodoArchive
+
+
+def candidates(cutoff, newest_id):
+    """
+    Todos completed before cutoff, oldest first. Read from todo_completed_idx in its order, every
+    batch starts at the front of the index without a scan or sort of the completed todos.
+    """
+    return Todo.objects.filter(completion_time__lt=cutoff).exclude(pk=newest_id).order_by('completion_time', 'pk')
+
+
+class Command(BaseCommand):
+    help = 'Moves todos completed more than --days days ago to the archive table in batches. ' \
+           'Every batch is its own transaction, an interrupted run continues where it stopped.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--batch-size', type=int, default=500, help='Todos moved per transaction')
+        parser.add_argument('--max-batches', type=int, help='Stop after this many batches')
+        parser.add_argument('--pause', type=float, default=0,
+                            help='Seconds to sleep between batches, lets other writers take the lock')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        # SQLite hands out max(id) + 1, the newest todo stays so that archived ids are never reused
+        newest_id = Todo.objects.aggregate(newest=Max('pk'))['newest']
+
+        moved = batches = 0
+        start = time.perf_counter()
+        while options['max_batches'] is None or batches < options['max_batches']:
+            count = self.move_batch(candidates(cutoff, newest_id), options['batch_size'])
+            if not count:
+                break
+            moved += count
+            batches += 1
+            self.stdout.write(f'Batch {batches}: {count} todos, {moved} in total')
+            if options['pause']:
+                time.sleep(options['pause'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {moved} todos completed before {cutoff:%Y-%m-%d} in {time.perf_counter() - start:.1f}s'))
+
+    def move_batch(self, candidates, batch_size):
+        with transaction.atomic():
+            rows = list(candidates.values(*TodoArchive.ARCHIVED_FIELDS)[:batch_size])
+            if not rows:
+                return 0
+            now = timezone.now()
+            TodoArchive.objects.bulk_create([TodoArchive(archive_time=now, **row) for row in rows])
+            # Nothing references todos, deleting without collecting or signals is safe
+            Todo.objects.filter(pk__in=[row['id'] for row in rows])._raw_delete(Todo.objects.db)
+        # Completed todos only show up in their owner's completed list
+        invalidate_lists({row['user_id'] for row in rows})
+        return len(rows)
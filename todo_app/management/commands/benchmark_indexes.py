@@ -0,0 +1,75 @@
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from todo_app.datagen import generate
+from todo_app.models import Todo, Group, GroupUser
+
+
+class Command(BaseCommand):
+    help = 'Seeds a large dataset and reports query plans and timings of the list queries ' \
+           'with and without the Todo/GroupUser indexes. All changes are rolled back.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=200)
+        parser.add_argument('--todos', type=int, default=200000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user, group = self.seed(options)
+            queries = [
+                ('current self', Todo.objects.filter(user=user, completion_time__isnull=True, group=None)
+                 .order_by('-creation_time')),
+                ('current group', Todo.objects.filter(group=group, completion_time__isnull=True)
+                 .order_by('-creation_time')),
+                ('completed', Todo.objects.filter(user=user, completion_time__isnull=False)
+                 .order_by('-completion_time')),
+                ('invites', GroupUser.objects.filter(user=user, status='I')),
+                ('membership', GroupUser.objects.filter(group=group, user=user)),
+            ]
+
+            self.toggle_indexes(create=False)
+            self.report('without indexes', queries, options['repeat'])
+            self.toggle_indexes(create=True)
+            self.report('with indexes', queries, options['repeat'])
+
+            transaction.set_rollback(True)
+
+    def seed(self, options):
+        prefix = f'bench{int(time.time())}'
+        users, groups = generate(users=options['users'], groups=options['groups'], members=10,
+                                 todos=options['todos'], completed=0.8, seed=options['seed'], prefix=prefix)
+        self.stdout.write(f"Seeded {len(users)} users, {len(groups)} groups and {options['todos']} todos")
+        return User.objects.get(pk=users[0]), Group.objects.get(pk=groups[0])
+
+    def toggle_indexes(self, create):
+        editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            for model in (Todo, GroupUser):
+                for index in model._meta.indexes:
+                    sql = index.create_sql(model, editor) if create else index.remove_sql(model, editor)
+                    cursor.execute(str(sql))
+            if connection.vendor in ('sqlite', 'postgresql'):
+                cursor.execute('ANALYZE')
+
+    def report(self, title, queries, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        explain = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+        for name, queryset in queries:
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(explain + sql, params)
+                plan = ' | '.join(str(row[-1]) for row in cursor.fetchall())
+
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - start) * 1000)
+            self.stdout.write(f'  {name:<14} median {statistics.median(timings):8.2f} ms  plan: {plan}')
@@ -0,0 +1,55 @@
+import os
+import shlex
+import socket
+import subprocess
+import sys
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Starts the project under a WSGI and an ASGI server on localhost and compares ' \
+           'concurrent read throughput with loadtest. Run generate_data first.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--prefix', default='gen')
+        parser.add_argument('--password', default='loadtest')
+        parser.add_argument('--wsgi-command', default=f'{sys.executable} manage.py runserver {{port}} --noreload',
+                            help='Command starting the WSGI server, {port} is substituted')
+        parser.add_argument('--asgi-command',
+                            default=f'{sys.executable} -m uvicorn todolist.asgi:application --port {{port}}',
+                            help='Command starting the ASGI server, {port} is substituted')
+        parser.add_argument('--port', type=int, default=8765)
+
+    def handle(self, *args, **options):
+        for name in ('wsgi', 'asgi'):
+            command = shlex.split(options[f'{name}_command'].format(port=options['port']))
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{name.upper()}: {' '.join(command)}"))
+            server = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                      env={**os.environ, 'TODO_ASYNC_VIEWS': '1' if name == 'asgi' else '0'})
+            try:
+                self.wait_for_port(options['port'], server)
+                call_command('loadtest', url=f"http://127.0.0.1:{options['port']}", read_only=True,
+                             requests=options['requests'], concurrency=options['concurrency'],
+                             users=options['users'], prefix=options['prefix'], password=options['password'],
+                             stdout=self.stdout)
+            finally:
+                server.terminate()
+                server.wait()
+
+    def wait_for_port(self, port, server, timeout=15):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'Server exited with code {server.returncode}')
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f'Server did not start listening on port {port}')
@@ -0,0 +1,54 @@
+import statistics
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+
+# (name, session engine, authentication backend)
+CONFIGURATIONS = [
+    ('db + ModelBackend', 'db', 'django.contrib.auth.backends.ModelBackend'),
+    ('cached_db + cached user', 'cached_db', 'todo_app.backends.CachedModelBackend'),
+    ('signed_cookies + cached user', 'signed_cookies', 'todo_app.backends.CachedModelBackend'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Counts the SQL queries per request, and those spent on the session and user, ' \
+           'for each session engine and authentication backend. Rows written are rolled back.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--path', default='/current/', help='Path requested by a logged in user')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'configuration':<32}{'queries':>9}{'session':>9}{'user':>6}")
+        with transaction.atomic():
+            for number, (name, engine, backend) in enumerate(CONFIGURATIONS):
+                with override_settings(SESSION_ENGINE=f'django.contrib.sessions.backends.{engine}',
+                                       AUTHENTICATION_BACKENDS=[backend], TODO_SHARED_CACHE=True):
+                    queries = self.measure(number, options['path'], options['requests'])
+                totals = [len(request) for request in queries]
+                session = [sum('django_session' in sql for sql in request) for request in queries]
+                user = [sum('FROM "auth_user"' in sql for sql in request) for request in queries]
+                self.stdout.write(f'{name:<32}{statistics.mean(totals):>9.1f}{statistics.mean(session):>9.1f}'
+                                  f'{statistics.mean(user):>6.1f}')
+            transaction.set_rollback(True)
+
+    def measure(self, number, path, requests):
+        """
+        Returns the SQL of every request after a first, warming one.
+        """
+        user = User.objects.create_user(f'benchmark_sessions_{number}', password='benchmark')
+        # A fresh client builds the middleware with the overridden session engine
+        client = Client()
+        client.force_login(user)
+        client.get(path)
+        queries = []
+        for _ in range(requests):
+            with CaptureQueriesContext(connection) as context:
+                client.get(path)
+            queries.append([query['sql'] for query in context.captured_queries])
+        return queries
@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.utils import timezone
+
+from todo_app.models import Todo
+
+
+class Command(BaseCommand):
+    help = 'Runs concurrent writer processes (create + complete todo) against a copy of the database ' \
+           'under the default and the production SQLite profile and compares throughput, latency ' \
+           'and "database is locked" errors.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=8)
+        parser.add_argument('--writes', type=int, default=200, help='Todos created and completed per process')
+        parser.add_argument('--profiles', nargs='+', default=['default', 'production'])
+        parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['worker'] is not None:
+            return self.work(options['worker'], options['writes'])
+        if connection.vendor != 'sqlite':
+            raise CommandError('The benchmark compares SQLite profiles')
+
+        self.stdout.write(f"{'profile':<12}{'writes/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'locked':>8}")
+        with tempfile.TemporaryDirectory() as directory:
+            for profile in options['profiles']:
+                # A fresh copy per profile, journal_mode=WAL sticks to the file
+                path = os.path.join(directory, f'{profile}.sqlite3')
+                shutil.copyfile(settings.DATABASES['default']['NAME'], path)
+                env = {**os.environ, 'TODO_SQLITE_PATH': path, 'TODO_SQLITE_PROFILE': profile}
+                subprocess.run([sys.executable, 'manage.py', 'migrate', '-v0'], env=env, check=True,
+                               cwd=settings.BASE_DIR)
+
+                workers = [subprocess.Popen([sys.executable, 'manage.py', 'benchmark_sqlite_writes',
+                                             f'--worker={number}', f"--writes={options['writes']}"],
+                                            env=env, stdout=subprocess.PIPE, cwd=settings.BASE_DIR)
+                           for number in range(options['processes'])]
+                results = [json.loads(worker.communicate()[0]) for worker in workers]
+                # Process start up is left out, only the span in which writers ran counts
+                elapsed = max(result['end'] for result in results) - min(result['start'] for result in results)
+
+                timings = sorted(took * 1000 for result in results for took in result['timings'])
+                locked = sum(result['locked'] for result in results)
+                cuts = statistics.quantiles(timings, n=100, method='inclusive') if len(timings) > 1 else [0] * 99
+                self.stdout.write(f'{profile:<12}{len(timings) / elapsed:>10.1f}{cuts[49]:>9.2f}'
+                                  f'{cuts[94]:>9.2f}{cuts[98]:>9.2f}{locked:>8}')
+
+    def work(self, number, writes):
+        """
+        Creates and completes todos like create_todo and complete_todo, prints timings as JSON.
+        """
+        user, _ = User.objects.get_or_create(username=f'benchmark_writer_{number}')
+        timings = []
+        locked = 0
+        start = time.time()
+        for i in range(writes):
+            began = time.perf_counter()
+            try:
+                # Autocommit like the views: every statement takes the write lock on its own
+                todo = Todo.objects.create(title=f'write {i}', user=user)
+                todo.completion_time = timezone.now()
+                todo.save()
+            except OperationalError as error:
+                if 'locked' not in str(error):
+                    raise
+                locked += 1
+                continue
+            timings.append(time.perf_counter() - began)
+        self.stdout.write(json.dumps({'timings': timings, 'locked': locked, 'start': start, 'end': time.time()}))
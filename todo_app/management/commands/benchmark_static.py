@@ -0,0 +1,64 @@
+import re
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+
+
+ASSET_RE = re.compile(r'<(link|script)\b[^>]*?(?:href|src)="([^"]+)"')
+
+
+def max_age(response):
+    match = re.search(r'max-age=(\d+)', response.get('Cache-Control', ''))
+    return int(match.group(1)) if match else 0
+
+
+class Command(BaseCommand):
+    help = 'Loads a page and its assets like a browser on a first and a repeat visit and reports requests, ' \
+           'bytes transferred and time until the render-blocking stylesheets are in. Run collectstatic first.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/login/', help='Page to load')
+        parser.add_argument('--accept-encoding', default='br, gzip')
+        parser.add_argument('--repeat-after', type=int, default=3600,
+                            help='Seconds between the visits, cached assets older than their max-age are refetched')
+
+    def handle(self, *args, **options):
+        if not settings.STATIC_ROOT:
+            raise CommandError('Set STATIC_ROOT and run collectstatic first')
+        client = Client(HTTP_ACCEPT_ENCODING=options['accept_encoding'])
+        browser_cache = {}
+        self.stdout.write(f"{'visit':<8}{'requests':>10}{'bytes':>10}{'cached':>8}{'external':>10}{'render ms':>11}")
+        # {% static %} gives hashed URLs only with DEBUG off, as in production
+        with override_settings(DEBUG=False):
+            for visit in ('first', 'repeat'):
+                self.visit(client, options['path'], browser_cache, visit, options['repeat_after'])
+
+    def visit(self, client, path, browser_cache, visit, repeat_after):
+        cached = external = 0
+        start = time.perf_counter()
+        page = client.get(path)
+        if page.status_code != 200:
+            raise CommandError(f'{path} returned {page.status_code}')
+        requests, transferred = 1, len(page.content)
+        # Rendering waits for the page and its stylesheets
+        render_time = time.perf_counter() - start
+
+        for kind, url in ASSET_RE.findall(page.content.decode()):
+            if url.startswith(('http://', 'https://', '//')):
+                # Not fetched: an air-gapped browser waits for these until they time out
+                external += 1
+                continue
+            if visit == 'repeat' and browser_cache.get(url, 0) > repeat_after:
+                cached += 1
+                continue
+            response = client.get(url)
+            body = b''.join(response.streaming_content) if response.streaming else response.content
+            requests += 1
+            transferred += len(body)
+            browser_cache[url] = max_age(response)
+            if kind == 'link' and url.endswith('.css'):
+                render_time = time.perf_counter() - start
+        self.stdout.write(f'{visit:<8}{requests:>10}{transferred:>10}{cached:>8}{external:>10}'
+                          f'{render_time * 1000:>11.2f}')
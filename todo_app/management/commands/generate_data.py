@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from todo_app.datagen import generate
+
+
+class Command(BaseCommand):
+    help = 'Bulk inserts a reproducible synthetic dataset of users, groups, memberships and todos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--members', type=int, default=5, help='Memberships per group')
+        parser.add_argument('--todos', type=int, default=10000)
+        parser.add_argument('--completed', type=float, default=0.7, help='Share of completed todos')
+        parser.add_argument('--group-todos', type=float, default=0.3, help='Share of group todos')
+        parser.add_argument('--invited', type=float, default=0.1, help='Share of pending invitations')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='gen', help='Prefix of generated usernames and group names')
+        parser.add_argument('--password', default='loadtest', help='Password of every generated user')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        with transaction.atomic():
+            user_ids, group_ids = generate(
+                users=options['users'], groups=options['groups'], members=options['members'],
+                todos=options['todos'], completed=options['completed'], group_todos=options['group_todos'],
+                invited=options['invited'], seed=options['seed'], prefix=options['prefix'],
+                password=options['password'], chunk_size=options['chunk_size'],
+            )
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {len(user_ids)} users, {len(group_ids)} groups and {options['todos']} todos "
+            f"in {elapsed:.1f}s ({options['todos'] / elapsed:.0f} todos/s)"
+        ))
@@ -0,0 +1,31 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from todo_app.transfer import FORMATS, import_todos, parse_rows
+
+
+class Command(BaseCommand):
+    help = 'Imports todos of a user from a CSV or NDJSON file, e.g. one made by the export view. ' \
+           'The file is read line by line and inserted in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Todos inserted per bulk_create')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user {options['username']}")
+        file_format = options['format'] or options['path'].rpartition('.')[2].lower()
+        if file_format not in FORMATS:
+            raise CommandError('Unknown format, pass --format')
+
+        with open(options['path'], encoding='utf-8', newline='') as lines:
+            created, skipped, errors, rate = import_todos(user, parse_rows(lines, file_format),
+                                                          options['batch_size'])
+        for number, message in errors:
+            self.stdout.write(f'Record {number}: {message}')
+        self.stdout.write(self.style.SUCCESS(f'Imported {created} todos, skipped {skipped}, {rate:.0f} rows/s'))
@@ -0,0 +1,204 @@
+import random
+import re
+import statistics
+import threading
+import time
+from collections import defaultdict
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import build_opener, HTTPCookieProcessor, HTTPRedirectHandler
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from todo_app.models import Todo, GroupUser
+
+
+# (weight, url name, method) of a typical session
+ROUTE_MIX = [
+    (30, 'current_todos', 'GET'),
+    (10, 'completed_todos', 'GET'),
+    (15, 'view_todo', 'GET'),
+    (5, 'edit_todo', 'GET'),
+    (10, 'groups', 'GET'),
+    (10, 'group', 'GET'),
+    (5, 'home', 'GET'),
+    (10, 'create_todo', 'POST'),
+    (5, 'complete_todo', 'POST'),
+]
+
+
+class _NoRedirect(HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class VirtualUser:
+    def __init__(self, user):
+        self.user = user
+        self.todo_ids = list(Todo.objects.filter(user=user, completion_time__isnull=True)
+                             .values_list('pk', flat=True)[:200])
+        self.group_ids = list(GroupUser.objects.filter(user=user, status__in=['C', 'M'])
+                              .values_list('group', flat=True))
+
+    def request(self, rnd, name, method):
+        """
+        Returns (path, POST data) for a route, or None when the user has nothing to request it for.
+        """
+        if name in ('view_todo', 'edit_todo', 'complete_todo'):
+            if not self.todo_ids:
+                return None
+            todo_id = rnd.choice(self.todo_ids)
+            if name == 'complete_todo':
+                self.todo_ids.remove(todo_id)
+                return f'/todo/{todo_id}/complete/', {}
+            return (f'/todo/{todo_id}/edit/' if name == 'edit_todo' else f'/todo/{todo_id}/'), None
+        if name == 'group':
+            return (f'/groups/{rnd.choice(self.group_ids)}/', None) if self.group_ids else None
+        if name == 'create_todo':
+            return '/create/', {'title': f'load test {rnd.random():.6f}', 'description': 'load test'}
+        return {'current_todos': '/current/', 'completed_todos': '/completed/', 'groups': '/groups/',
+                'home': '/'}[name], None
+
+
+class Command(BaseCommand):
+    help = 'Replays a realistic mix of routes through the test client (default) or a running server ' \
+           'and reports latency percentiles, throughput and SQL queries per route.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--users', type=int, default=20, help='Number of users to replay sessions for')
+        parser.add_argument('--prefix', default='gen', help='Username prefix used by generate_data')
+        parser.add_argument('--password', default='loadtest', help='Password of the users (server mode)')
+        parser.add_argument('--url', help='Base URL of a running server, e.g. http://127.0.0.1:8000')
+        parser.add_argument('--concurrency', type=int, default=1, help='Worker threads (server mode)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--read-only', action='store_true', help='Replay only the GET routes')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the rows written by the test client instead of rolling them back')
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        users = list(User.objects.filter(username__startswith=f"{options['prefix']}_user")
+                     .order_by('pk')[:options['users']])
+        if not users:
+            raise CommandError('No users found, run generate_data first')
+        virtual_users = [VirtualUser(user) for user in users]
+
+        routes = [route for route in ROUTE_MIX if route[2] == 'GET' or not options['read_only']]
+        weights = [weight for weight, _, _ in routes]
+        plan = []
+        for _ in range(options['requests']):
+            _, name, method = rnd.choices(routes, weights)[0]
+            plan.append((rnd.choice(virtual_users), name, method))
+
+        if options['url']:
+            samples, elapsed = self.run_server(plan, rnd, options)
+        else:
+            samples, elapsed = self.run_client(plan, rnd, options['keep'])
+        self.report(samples, elapsed)
+
+    def run_client(self, plan, rnd, keep):
+        samples = defaultdict(list)
+        clients = {}
+        start = time.perf_counter()
+        with transaction.atomic():
+            for virtual_user, name, method in plan:
+                request = virtual_user.request(rnd, name, method)
+                if request is None:
+                    continue
+                client = clients.get(virtual_user.user.pk)
+                if client is None:
+                    client = clients[virtual_user.user.pk] = Client()
+                    client.force_login(virtual_user.user)
+                path, data = request
+                with CaptureQueriesContext(connection) as queries:
+                    began = time.perf_counter()
+                    response = client.post(path, data) if method == 'POST' else client.get(path)
+                    took = time.perf_counter() - began
+                samples[name].append((took, len(queries.captured_queries), response.status_code))
+            if not keep:
+                transaction.set_rollback(True)
+        return samples, time.perf_counter() - start
+
+    def run_server(self, plan, rnd, options):
+        base = options['url'].rstrip('/')
+        openers = {}
+        for virtual_user in {virtual_user for virtual_user, _, _ in plan}:
+            openers[virtual_user.user.pk] = self.login(base, virtual_user.user.username, options['password'])
+
+        samples = defaultdict(list)
+        lock = threading.Lock()
+        requests = [(virtual_user, name, method, virtual_user.request(rnd, name, method))
+                    for virtual_user, name, method in plan]
+        queue = iter([request for request in requests if request[3] is not None])
+
+        def worker():
+            while True:
+                with lock:
+                    item = next(queue, None)
+                if item is None:
+                    return
+                virtual_user, name, method, (path, data) = item
+                opener, csrf_token = openers[virtual_user.user.pk]
+                body = urlencode({**data, 'csrfmiddlewaretoken': csrf_token()}).encode() \
+                    if method == 'POST' else None
+                began = time.perf_counter()
+                try:
+                    with opener.open(base + path, body) as response:
+                        response.read()
+                        status = response.status
+                except HTTPError as error:
+                    status = error.code
+                took = time.perf_counter() - began
+                with lock:
+                    samples[name].append((took, None, status))
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(options['concurrency'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return samples, time.perf_counter() - start
+
+    def login(self, base, username, password):
+        cookies = CookieJar()
+        opener = build_opener(HTTPCookieProcessor(cookies), _NoRedirect)
+
+        def csrf_token():
+            return next((cookie.value for cookie in cookies if cookie.name == 'csrftoken'), '')
+
+        with opener.open(f'{base}/login/') as response:
+            page = response.read().decode()
+        token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', page)
+        body = urlencode({'username': username, 'password': password,
+                          'csrfmiddlewaretoken': token.group(1) if token else csrf_token()}).encode()
+        try:
+            opener.open(f'{base}/login/', body).close()
+        except HTTPError as error:
+            if error.code != 302:
+                raise CommandError(f'Could not log in as {username}: HTTP {error.code}')
+        return opener, csrf_token
+
+    def report(self, samples, elapsed):
+        total = sum(len(route_samples) for route_samples in samples.values())
+        self.stdout.write(f"{'route':<16}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+                          f"{'queries':>9}{'errors':>8}")
+        for name, route_samples in sorted(samples.items()):
+            timings = sorted(took * 1000 for took, _, _ in route_samples)
+            if len(timings) > 1:
+                cuts = statistics.quantiles(timings, n=100, method='inclusive')
+                p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+            else:
+                p50 = p95 = p99 = timings[0]
+            query_counts = [queries for _, queries, _ in route_samples if queries is not None]
+            queries = f'{statistics.mean(query_counts):.1f}' if query_counts else 'n/a'
+            errors = sum(1 for _, _, status in route_samples if status >= 400)
+            self.stdout.write(f'{name:<16}{len(timings):>7}{p50:>10.2f}{p95:>10.2f}{p99:>10.2f}'
+                              f'{queries:>9}{errors:>8}')
+        self.stdout.write(f'{total} requests in {elapsed:.2f}s, {total / elapsed:.1f} req/s')
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from todo_app.models import Group
+from todo_app.purge import purge_group
+
+
+class Command(BaseCommand):
+    help = 'Removes the rows of deleted groups in batches of raw DELETEs, without loading them or ' \
+           'sending signals. An interrupted run continues where it stopped.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows deleted per statement')
+        parser.add_argument('--pause', type=float, default=0,
+                            help='Seconds to sleep between batches, lets other writers take the lock')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        group_ids = list(Group.objects.filter(deleted_at__isnull=False).values_list('pk', flat=True))
+        deleted = 0
+        for group_id in group_ids:
+            count = purge_group(group_id, options['batch_size'], options['pause'])
+            deleted += count
+            self.stdout.write(f'Group {group_id}: {count} rows')
+        self.stdout.write(self.style.SUCCESS(
+            f'Purged {len(group_ids)} groups, {deleted} rows in {time.perf_counter() - start:.1f}s'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from todo_app.counters import FIELDS, reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Recounts the todo counters from the todo and archive tables and fixes the ones that drifted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report the drift')
+
+    def handle(self, *args, **options):
+        drifted = reconcile_counters(fix=not options['dry_run'])
+        for counter, stored, actual in drifted:
+            owner = f'group {counter.group_id}' if counter.group_id is not None else f'user {counter.user_id}'
+            drift = ', '.join(f'{field} {stored[field]} -> {actual[field]}'
+                              for field in FIELDS if stored[field] != actual[field])
+            self.stdout.write(f'{owner}: {drift}')
+        verb = 'Found' if options['dry_run'] else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(drifted)} drifted counters'))
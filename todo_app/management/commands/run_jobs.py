@@ -0,0 +1,70 @@
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import django
+from django.core.management.base import BaseCommand
+
+from todo_app.jobs import claim, heartbeat, requeue_stale, run_pooled
+from todo_app.metrics import job_registry
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs in a pool of --workers threads or processes, polling the job ' \
+           'table every --poll seconds. With --once it stops when no job is due.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Jobs run at the same time')
+        parser.add_argument('--pool', choices=('thread', 'process'), default='thread',
+                            help='Processes suit CPU bound tasks, threads waiting on the database or mail')
+        parser.add_argument('--poll', type=float, default=1, help='Seconds between checks of the queue')
+        parser.add_argument('--once', action='store_true', help='Exit when the queue has no due jobs')
+        parser.add_argument('--metrics-file', help='Keeps job metrics in this file in the Prometheus text format')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if options['pool'] == 'process':
+            # Fresh interpreters, a forked child would share the parent's database connection
+            executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'),
+                                           initializer=django.setup)
+        else:
+            executor = ThreadPoolExecutor(workers)
+        running = {}
+        start = time.perf_counter()
+        finished = 0
+        with executor:
+            while True:
+                if running:
+                    heartbeat([job.claim for job in running.values()])
+                requeue_stale()
+                if len(running) < workers:
+                    for job in claim(workers - len(running)):
+                        running[executor.submit(run_pooled, job.pk, job.claim)] = job
+                if not running:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll'])
+                    continue
+                done, _ = wait(running, timeout=options['poll'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = running.pop(future)
+                    finished += 1
+                    self._record(job, future, options['metrics_file'])
+        self.stdout.write(self.style.SUCCESS(f'Ran {finished} jobs in {time.perf_counter() - start:.1f}s'))
+
+    def _record(self, job, future, metrics_file):
+        try:
+            result = future.result()
+        except Exception as error:
+            # The job stays running until requeue_stale() gives it back
+            self.stderr.write(f'{job}: worker error {error!r}')
+            return
+        if result is None:
+            return
+        task_name, outcome, duration, wait_time = result
+        job_registry.observe(task_name, outcome, {'todo_job_duration_seconds': duration,
+                                                  'todo_job_wait_seconds': wait_time})
+        self.stdout.write(f'{job}: {outcome} in {duration:.2f}s after waiting {wait_time:.1f}s')
+        if metrics_file:
+            with open(metrics_file, 'w') as file:
+                file.write(job_registry.exposition())
@@ -0,0 +1,36 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from todo_app.reminders import send_batch
+
+
+class Command(BaseCommand):
+    help = 'Emails reminders of open todos due within --window minutes, in batches. With --loop it keeps ' \
+           'scanning every --interval seconds. Every todo is reminded once per due time.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window', type=int, default=15, help='Minutes ahead of now to remind of')
+        parser.add_argument('--batch-size', type=int, default=100, help='Reminders sent per mail connection')
+        parser.add_argument('--loop', action='store_true', help='Run until interrupted')
+        parser.add_argument('--interval', type=float, default=60, help='Seconds between scans with --loop')
+
+    def handle(self, *args, **options):
+        window = timedelta(minutes=options['window'])
+        while True:
+            start = time.perf_counter()
+            now = timezone.now()
+            sent = unreachable = 0
+            while True:
+                count, skipped = send_batch(now, window, options['batch_size'])
+                if not count:
+                    break
+                sent += count - skipped
+                unreachable += skipped
+            self.stdout.write(f'{now:%Y-%m-%d %H:%M:%S}: reminded of {sent} todos, skipped {unreachable} '
+                              f'without an email address in {time.perf_counter() - start:.2f}s')
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
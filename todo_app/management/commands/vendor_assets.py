@@ -0,0 +1,35 @@
+import base64
+import hashlib
+import os
+from urllib.request import urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from todo_app.static import VENDOR_ASSETS
+
+
+class Command(BaseCommand):
+    help = 'Downloads the third-party CSS and JavaScript into static/vendor and checks them against ' \
+           'their integrity hashes. Run it once on a machine with internet access and commit the files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Download files that are already there')
+
+    def handle(self, *args, **options):
+        static_dir = settings.STATICFILES_DIRS[0]
+        for name, (path, url, integrity) in VENDOR_ASSETS.items():
+            target = os.path.join(static_dir, path)
+            if os.path.exists(target) and not options['force']:
+                self.stdout.write(f'{name}: {path} exists')
+                continue
+            with urlopen(url, timeout=30) as response:
+                data = response.read()
+            algorithm, expected = integrity.split('-', 1)
+            if base64.b64encode(hashlib.new(algorithm, data).digest()).decode() != expected:
+                raise CommandError(f'{url} does not match its integrity hash')
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as file:
+                file.write(data)
+            self.stdout.write(f'{name}: {len(data)} bytes to {path}')
+        self.stdout.write(self.style.SUCCESS('Run collectstatic to hash and compress them'))
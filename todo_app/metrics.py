@@ -0,0 +1,97 @@
+import bisect
+import threading
+from collections import defaultdict
+
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+JOB_BUCKETS = (0.01, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600)
+SIZE_BUCKETS = (1000, 5000, 10000, 50000, 100000, 500000, 1000000, 5000000)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """
+    In-memory request metrics of this process, keyed by URL name.
+    """
+    COUNTER = ('todo_requests_total', 'Requests by view and status code')
+    LABEL = 'view'
+    HISTOGRAMS = {
+        'todo_request_duration_seconds': ('Wall time of requests', DURATION_BUCKETS),
+        'todo_request_queries': ('SQL queries per request', QUERY_BUCKETS),
+        'todo_request_query_duration_seconds': ('Time spent in SQL per request', DURATION_BUCKETS),
+        'todo_template_render_seconds': ('Template render time per request', DURATION_BUCKETS),
+        'todo_response_size_bytes': ('Size of non-streaming response bodies', SIZE_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {name: {} for name in self.HISTOGRAMS}
+            self._requests = defaultdict(int)
+
+    def observe(self, key, status, values):
+        """
+        Records one request, values maps histogram names to observations.
+        """
+        with self._lock:
+            self._requests[key, status] += 1
+            for name, value in values.items():
+                histograms = self._histograms[name]
+                if key not in histograms:
+                    histograms[key] = Histogram(self.HISTOGRAMS[name][1])
+                histograms[key].observe(value)
+
+    def exposition(self):
+        """
+        Returns the metrics in the Prometheus text format.
+        """
+        counter, counter_help = self.COUNTER
+        label = self.LABEL
+        lines = [f'# HELP {counter} {counter_help}',
+                 f'# TYPE {counter} counter']
+        with self._lock:
+            for (key, status), count in sorted(self._requests.items()):
+                lines.append(f'{counter}{{{label}="{key}",status="{status}"}} {count}')
+            for name, (help_text, buckets) in self.HISTOGRAMS.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for key, histogram in sorted(self._histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip((*buckets, '+Inf'), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{label}="{key}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{{label}="{key}"}} {histogram.sum}')
+                    lines.append(f'{name}_count{{{label}="{key}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+class JobRegistry(Registry):
+    """
+    Metrics of the jobs run by this worker process, keyed by task name.
+    """
+    COUNTER = ('todo_jobs_total', 'Job runs by task and outcome')
+    LABEL = 'task'
+    HISTOGRAMS = {
+        'todo_job_duration_seconds': ('Run time of jobs', JOB_BUCKETS),
+        'todo_job_wait_seconds': ('Time jobs were due before a worker started them', JOB_BUCKETS),
+    }
+
+
+registry = Registry()
+job_registry = JobRegistry()
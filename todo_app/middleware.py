@@ -0,0 +1,100 @@
+import logging
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import Template
+
+from .metrics import registry
+
+
+logger = logging.getLogger('todo_app.slow_requests')
+
+_current_stats = ContextVar('todo_request_stats', default=None)
+
+
+class RequestStats:
+    def __init__(self, keep_sql):
+        self.queries = 0
+        self.query_time = 0
+        self.render_time = 0
+        self.statements = [] if keep_sql else None
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            took = time.perf_counter() - start
+            self.queries += 1
+            self.query_time += took
+            if self.statements is not None and len(self.statements) < 100:
+                self.statements.append((took, sql))
+
+
+def _instrument_template_rendering():
+    """
+    Times the rendering of top-level templates (render() and render_to_string()) per request.
+    """
+    if getattr(Template.render, 'instrumented', False):
+        return
+    original_render = Template.render
+
+    def render(self, *args, **kwargs):
+        stats = _current_stats.get()
+        if stats is None:
+            return original_render(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return original_render(self, *args, **kwargs)
+        finally:
+            stats.render_time += time.perf_counter() - start
+
+    render.instrumented = True
+    Template.render = render
+
+
+class PerformanceMiddleware:
+    """
+    Records wall time, SQL query count and time, template render time and response size of every
+    request per URL name. Requests slower than TODO_SLOW_REQUEST_THRESHOLD seconds are logged with
+    their SQL statements.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        _instrument_template_rendering()
+
+    def __call__(self, request):
+        threshold = getattr(settings, 'TODO_SLOW_REQUEST_THRESHOLD', None)
+        stats = RequestStats(keep_sql=threshold is not None)
+        token = _current_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(stats.execute_wrapper))
+                response = self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        duration = time.perf_counter() - start
+
+        view = request.resolver_match.url_name if request.resolver_match else None
+        values = {
+            'todo_request_duration_seconds': duration,
+            'todo_request_queries': stats.queries,
+            'todo_request_query_duration_seconds': stats.query_time,
+            'todo_template_render_seconds': stats.render_time,
+        }
+        if not response.streaming:
+            values['todo_response_size_bytes'] = len(response.content)
+        registry.observe(view or 'unresolved', response.status_code, values)
+
+        if threshold is not None and duration > threshold:
+            logger.warning(
+                'Slow request %s %s (%s) took %.3fs, %d queries in %.3fs:\n%s',
+                request.method, request.path, view, duration, stats.queries, stats.query_time,
+                '\n'.join(f'  {took * 1000:.1f}ms {sql}' for took, sql in stats.statements),
+            )
+        return response
@@ -0,0 +1,47 @@
+# Generated by Django 3.0.14 on 2026-10-18 07:43
+
+from django.db import migrations, models
+
+
+STATUS_RANK = {'C': 0, 'M': 1, 'I': 2}
+
+
+def remove_duplicate_memberships(apps, schema_editor):
+    GroupUser = apps.get_model('todo_app', 'GroupUser')
+    duplicated = GroupUser.objects.values('group', 'user') \
+        .annotate(count=models.Count('pk')).filter(count__gt=1)
+    for pair in duplicated:
+        memberships = sorted(GroupUser.objects.filter(group=pair['group'], user=pair['user']),
+                             key=lambda membership: (STATUS_RANK[membership.status], membership.pk))
+        GroupUser.objects.filter(pk__in=[membership.pk for membership in memberships[1:]]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo_app', '0007_auto_20200629_0202'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='groupuser',
+            index=models.Index(fields=['user', 'status'], name='groupuser_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(condition=models.Q(('completion_time__isnull', True), ('group__isnull', True)), fields=['user', '-creation_time'], name='todo_user_open_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(condition=models.Q(completion_time__isnull=True), fields=['group', '-creation_time'], name='todo_group_open_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(condition=models.Q(completion_time__isnull=False), fields=['user', '-completion_time'], name='todo_user_completed_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_memberships, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='groupuser',
+            constraint=models.UniqueConstraint(fields=('group', 'user'), name='unique_group_user'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.14 on 2026-10-18 07:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo_app', '0008_todo_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='todo',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
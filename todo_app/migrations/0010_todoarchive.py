@@ -0,0 +1,35 @@
+# Generated by Django 3.0.14 on 2026-10-18 08:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('todo_app', '0009_todo_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TodoArchive',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=150)),
+                ('description', models.TextField(blank=True)),
+                ('importance', models.BooleanField(default=False)),
+                ('creation_time', models.DateTimeField()),
+                ('completion_time', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archive_time', models.DateTimeField(auto_now_add=True)),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='todo_app.Group')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='todoarchive',
+            index=models.Index(fields=['user', '-completion_time'], name='todoarchive_user_completed_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.0.14 on 2026-10-18 08:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('todo_app', '0010_todoarchive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TodoCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('open', models.IntegerField(default=0)),
+                ('completed', models.IntegerField(default=0)),
+                ('important', models.IntegerField(default=0)),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='todo_app.Group')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='todocounter',
+            constraint=models.UniqueConstraint(condition=models.Q(group__isnull=True), fields=('user',), name='unique_user_counter'),
+        ),
+        migrations.AddConstraint(
+            model_name='todocounter',
+            constraint=models.UniqueConstraint(condition=models.Q(user__isnull=True), fields=('group',), name='unique_group_counter'),
+        ),
+        migrations.AddConstraint(
+            model_name='todocounter',
+            constraint=models.CheckConstraint(check=models.Q(models.Q(('group__isnull', False), ('user__isnull', True)), models.Q(('group__isnull', True), ('user__isnull', False)), _connector='OR'), name='counter_user_or_group'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.0.14 on 2026-10-18 08:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo_app', '0011_todocounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='group',
+            index=models.Index(condition=models.Q(deleted_at__isnull=False), fields=['deleted_at'], name='group_deleted_idx'),
+        ),
+    ]
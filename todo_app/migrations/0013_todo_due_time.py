@@ -0,0 +1,32 @@
+# Generated by Django 3.0.14 on 2026-10-18 08:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo_app', '0012_group_deleted_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='todo',
+            name='due_time',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='todo',
+            name='reminder_sent_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='todoarchive',
+            name='due_time',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(condition=models.Q(('completion_time__isnull', True), ('due_time__isnull', False), ('reminder_sent_at__isnull', True)), fields=['due_time'], name='todo_reminder_due_idx'),
+        ),
+    ]
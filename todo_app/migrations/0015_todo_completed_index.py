@@ -0,0 +1,17 @@
+# Generated by Django 3.0.14 on 2026-10-18 08:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo_app', '0014_job'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(condition=models.Q(completion_time__isnull=False), fields=['completion_time', 'id'], name='todo_completed_idx'),
+        ),
+    ]
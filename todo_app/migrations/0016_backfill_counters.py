@@ -0,0 +1,47 @@
+from collections import defaultdict
+
+from django.db import migrations
+from django.db.models import Count, Q
+
+
+def backfill_counters(apps, schema_editor):
+    """
+    Creates the counter of every user and group with todos and recounts the existing ones, which
+    may have lost writes while they were created by their first read.
+    """
+    Todo = apps.get_model('todo_app', 'Todo')
+    TodoArchive = apps.get_model('todo_app', 'TodoArchive')
+    TodoCounter = apps.get_model('todo_app', 'TodoCounter')
+    counts = defaultdict(lambda: {'open': 0, 'completed': 0, 'important': 0})
+    for field, todos, archived in (
+            ('user', Todo.objects.filter(group=None), TodoArchive.objects.filter(group=None)),
+            ('group', Todo.objects.exclude(group=None), TodoArchive.objects.exclude(group=None))):
+        rows = todos.values(field).order_by().annotate(
+            open=Count('pk', filter=Q(completion_time__isnull=True)),
+            completed=Count('pk', filter=Q(completion_time__isnull=False)),
+            important=Count('pk', filter=Q(completion_time__isnull=True, importance=True)),
+        )
+        for row in rows:
+            key = (row.pop(field), None) if field == 'user' else (None, row.pop(field))
+            counts[key].update(row)
+        for row in archived.values(field).order_by().annotate(archived=Count('pk')):
+            key = (row[field], None) if field == 'user' else (None, row[field])
+            counts[key]['completed'] += row['archived']
+
+    for counter in TodoCounter.objects.all():
+        expected = counts.pop((counter.user_id, counter.group_id), {'open': 0, 'completed': 0, 'important': 0})
+        if expected != {'open': counter.open, 'completed': counter.completed, 'important': counter.important}:
+            TodoCounter.objects.filter(pk=counter.pk).update(**expected)
+    TodoCounter.objects.bulk_create([TodoCounter(user_id=user_id, group_id=group_id, **values)
+                                     for (user_id, group_id), values in counts.items()], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo_app', '0015_todo_completed_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
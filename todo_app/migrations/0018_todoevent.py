@@ -0,0 +1,23 @@
+# Generated by Django 3.0.14 on 2026-10-18 08:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo_app', '0017_job_heartbeat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TodoEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('group_id', models.IntegerField()),
+                ('event_type', models.CharField(max_length=10)),
+                ('data', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
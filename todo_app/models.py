@@ -1,10 +1,18 @@
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import User
 
 
 class Group(models.Model):
     name = models.CharField(max_length=100)
     users = models.ManyToManyField(User, through='GroupUser')
+    # Deleted groups are hidden at once and their rows removed later by the purge_groups command
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at'], name='group_deleted_idx', condition=Q(deleted_at__isnull=False)),
+        ]
 
     def __str__(self):
         return self.name
@@ -16,13 +24,82 @@ class Todo(models.Model):
     importance = models.BooleanField(default=False)
     creation_time = models.DateTimeField(auto_now_add=True)
     completion_time = models.DateTimeField(null=True, blank=True)
+    due_time = models.DateTimeField(null=True, blank=True)
+    # Set by the send_reminders worker, cleared when due_time changes
+    reminder_sent_at = models.DateTimeField(null=True, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # Only the open todos still waiting for their reminder
+            models.Index(fields=['due_time'], name='todo_reminder_due_idx',
+                         condition=Q(completion_time__isnull=True, due_time__isnull=False,
+                                     reminder_sent_at__isnull=True)),
+            models.Index(fields=['user', '-creation_time'], name='todo_user_open_idx',
+                         condition=Q(completion_time__isnull=True, group__isnull=True)),
+            models.Index(fields=['group', '-creation_time'], name='todo_group_open_idx',
+                         condition=Q(completion_time__isnull=True)),
+            models.Index(fields=['user', '-completion_time'], name='todo_user_completed_idx',
+                         condition=Q(completion_time__isnull=False)),
+            # archive_todos takes the oldest completed todos of all users in this order
+            models.Index(fields=['completion_time', 'id'], name='todo_completed_idx',
+                         condition=Q(completion_time__isnull=False)),
+        ]
+
+    def __str__(self):
+        return self.title
+
+
+class TodoArchive(models.Model):
+    """
+    Completed todos moved out of Todo by the archive_todos command, under their original ids.
+    """
+    id = models.IntegerField(primary_key=True)
+    title = models.CharField(max_length=150)
+    description = models.TextField(blank=True)
+    importance = models.BooleanField(default=False)
+    creation_time = models.DateTimeField()
+    completion_time = models.DateTimeField()
+    due_time = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField()
+    archive_time = models.DateTimeField(auto_now_add=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     group = models.ForeignKey(Group, on_delete=models.CASCADE, blank=True, null=True)
 
+    ARCHIVED_FIELDS = ('id', 'title', 'description', 'importance', 'creation_time', 'completion_time',
+                       'due_time', 'updated_at', 'user_id', 'group_id')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-completion_time'], name='todoarchive_user_completed_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
 
+class TodoCounter(models.Model):
+    """
+    Open, completed and important open todo counts of either a user's own todos (group is empty) or
+    a group's todos, maintained by todo_app.counters.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, blank=True, null=True)
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, blank=True, null=True)
+    open = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+    important = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user'], condition=Q(group__isnull=True), name='unique_user_counter'),
+            models.UniqueConstraint(fields=['group'], condition=Q(user__isnull=True), name='unique_group_counter'),
+            models.CheckConstraint(check=Q(user__isnull=True, group__isnull=False) |
+                                   Q(user__isnull=False, group__isnull=True), name='counter_user_or_group'),
+        ]
+
+
 class GroupUser(models.Model):
     group = models.ForeignKey(Group, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -32,3 +109,60 @@ class GroupUser(models.Model):
         ('I', 'Invited')
     )
     status = models.CharField(max_length=1, choices=STATUS_TYPES)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'status'], name='groupuser_user_status_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['group', 'user'], name='unique_group_user'),
+        ]
+
+
+class TodoEvent(models.Model):
+    """
+    A change of a group's todos, sent to the group's Server-Sent Events streams by todo_app.events.
+    The group is a plain id, events of purged groups are dropped with the history.
+    """
+    group_id = models.IntegerField()
+    event_type = models.CharField(max_length=10)
+    # JSON of the event data
+    data = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class Job(models.Model):
+    """
+    A background job run by the run_jobs worker, see todo_app.jobs.
+    """
+    task = models.CharField(max_length=100)
+    # JSON of the keyword arguments
+    arguments = models.TextField(default='{}')
+    STATUS_TYPES = (
+        ('Q', 'Queued'),
+        ('R', 'Running'),
+        ('D', 'Done'),
+        ('F', 'Failed')
+    )
+    status = models.CharField(max_length=1, choices=STATUS_TYPES, default='Q')
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    run_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Touched by the worker while the job runs, see jobs.heartbeat()
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Token of the worker claim that runs the job
+    claim = models.CharField(max_length=32, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['run_at'], name='job_queued_idx', condition=Q(status='Q')),
+            models.Index(fields=['heartbeat_at'], name='job_running_idx', condition=Q(status='R')),
+            models.Index(fields=['claim'], name='job_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.task} #{self.pk}'
@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+CURSOR_SALT = 'todo_app.pagination'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def page_size():
+    return getattr(settings, 'TODO_PAGE_SIZE', 50)
+
+
+def encode_cursor(list_id, todo, field):
+    return signing.dumps([list_id, getattr(todo, field).isoformat(), todo.pk], salt=CURSOR_SALT)
+
+
+def decode_cursor(token):
+    """
+    Returns (list id, sort value, pk) stored in an ``after`` token.
+    """
+    try:
+        list_id, value, pk = signing.loads(token, salt=CURSOR_SALT)
+        value = parse_datetime(value)
+    except (signing.BadSignature, ValueError, TypeError):
+        raise InvalidCursor(token)
+    if value is None or not isinstance(pk, int):
+        raise InvalidCursor(token)
+    return list_id, value, pk
+
+
+def split_page(rows, field, list_id):
+    """
+    Cuts rows fetched with one extra item into a page and the cursor of the next page.
+    """
+    size = page_size()
+    if len(rows) > size:
+        return rows[:size], encode_cursor(list_id, rows[size - 1], field)
+    return rows, None
+
+
+def _page_rows(queryset, field, cursor):
+    if cursor is not None:
+        _, value, pk = cursor
+        queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk}))
+    return list(queryset.order_by(f'-{field}', '-pk')[:page_size() + 1])
+
+
+def keyset_page(queryset, field, list_id, cursor=None):
+    """
+    Returns a page of queryset ordered newest first by (field, pk) starting after cursor.
+    """
+    return split_page(_page_rows(queryset, field, cursor), field, list_id)
+
+
+def merged_keyset_page(querysets, field, list_id, cursor=None):
+    """
+    keyset_page over several querysets whose rows never share a pk, like a table and its archive.
+    """
+    rows = [row for queryset in querysets for row in _page_rows(queryset, field, cursor)]
+    rows.sort(key=lambda row: (getattr(row, field), row.pk), reverse=True)
+    return split_page(rows[:page_size() + 1], field, list_id)
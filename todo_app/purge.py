@@ -0,0 +1,28 @@
+import time
+
+from .models import Todo, TodoArchive, TodoCounter, Group, GroupUser
+
+
+# Rows referencing a group, deleted before the group itself
+GROUP_ROWS = (Todo, TodoArchive, TodoCounter, GroupUser)
+
+
+def purge_group(group_id, batch_size=1000, pause=0):
+    """
+    Deletes a deleted group and every row referencing it, batch_size rows per statement.
+    Returns the number of rows deleted.
+    """
+    if not Group.objects.filter(pk=group_id, deleted_at__isnull=False).exists():
+        return 0
+    deleted = 0
+    for model in GROUP_ROWS:
+        rows = model.objects.filter(group=group_id).order_by('pk').values_list('pk', flat=True)
+        while True:
+            # Every batch commits on its own, the search index triggers drop the todos from the index
+            count = model.objects.filter(pk__in=list(rows[:batch_size]))._raw_delete(model.objects.db)
+            deleted += count
+            if count < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+    return deleted + Group.objects.filter(pk=group_id, deleted_at__isnull=False)._raw_delete(Group.objects.db)
@@ -0,0 +1,70 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from .access import ACTIVE_STATUSES
+from .models import Todo, GroupUser
+
+
+def pending_reminders(now, window):
+    """
+    Open todos due before now + window whose reminder was not sent, earliest first. The conditions
+    are those of todo_reminder_due_idx, so only the pending part of the table is scanned.
+    """
+    return Todo.objects.filter(completion_time__isnull=True, due_time__isnull=False, reminder_sent_at__isnull=True,
+                               due_time__lte=now + window, group__deleted_at__isnull=True) \
+        .order_by('due_time', 'pk')
+
+
+def _recipients(todos):
+    """
+    Returns the email addresses to remind of every todo by id: its author, or the active members
+    of its group. Users without an address are left out.
+    """
+    group_ids = {todo.group_id for todo in todos if todo.group_id is not None}
+    members = defaultdict(list)
+    for group_id, email in GroupUser.objects.filter(group__in=group_ids, status__in=ACTIVE_STATUSES) \
+            .values_list('group', 'user__email'):
+        members[group_id].append(email)
+    return {todo.pk: [email for email in (members[todo.group_id] if todo.group_id else [todo.user.email]) if email]
+            for todo in todos}
+
+
+def _message(todo, recipients):
+    url = getattr(settings, 'TODO_SITE_URL', 'http://localhost:8000') + reverse('view_todo', args=[todo.pk])
+    due = timezone.localtime(todo.due_time)
+    return EmailMessage(f'Reminder: {todo.title}', f'"{todo.title}" is due {due:%d.%m.%Y %H:%M}.\n\n{url}\n',
+                        to=recipients)
+
+
+def send_batch(now, window, batch_size):
+    """
+    Sends the reminders of the next batch_size pending todos over one mail connection. Returns the
+    number of todos handled and, of those, the number nobody could be reminded of for lack of an
+    email address.
+
+    The todos are marked sent before the mail goes out: a crash in between loses their reminders
+    instead of sending them twice. A failed send clears the marks again for the next run.
+    """
+    with transaction.atomic():
+        # Concurrent workers skip each other's batches where the database can lock rows
+        todos = list(pending_reminders(now, window).select_related('user')
+                     .select_for_update(skip_locked=True, of=('self',))[:batch_size])
+        if not todos:
+            return 0, 0
+        ids = [todo.pk for todo in todos]
+        # update() keeps updated_at, nothing shown on the pages changes
+        Todo.objects.filter(pk__in=ids).update(reminder_sent_at=now)
+
+    recipients = _recipients(todos)
+    messages = [_message(todo, recipients[todo.pk]) for todo in todos if recipients[todo.pk]]
+    try:
+        get_connection().send_messages(messages)
+    except Exception:
+        Todo.objects.filter(pk__in=ids, reminder_sent_at=now).update(reminder_sent_at=None)
+        raise
+    return len(todos), len(todos) - len(messages)
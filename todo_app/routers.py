@@ -0,0 +1,103 @@
+import asyncio
+import functools
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+
+PIN_COOKIE = 'todo_pin_primary'
+
+_current_request = ContextVar('todo_replica_request', default=None)
+
+
+class _RequestState:
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.wrote = False
+        self.replica_view = False
+
+
+def reads_from_replica():
+    """
+    Whether reads made now go to TODO_REPLICA_DATABASE.
+    """
+    state = _current_request.get()
+    return bool(getattr(settings, 'TODO_REPLICA_DATABASE', None) and state is not None
+                and state.replica_view and not state.pinned and not state.wrote)
+
+
+class ReplicaRouter:
+    """
+    Sends the reads of views decorated with replica_reads to TODO_REPLICA_DATABASE and every write
+    to the default database.
+
+    A client that wrote gets the pin cookie from ReplicaMiddleware and reads from the default
+    database for TODO_REPLICA_PIN_SECONDS, so the page it is redirected to shows its own writes.
+    """
+    def db_for_read(self, model, **hints):
+        if reads_from_replica():
+            return settings.TODO_REPLICA_DATABASE
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _current_request.get()
+        if state is not None:
+            state.wrote = True
+        # Explicitly, or the write would follow an instance that was read from the replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows
+        return True
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = _RequestState(pinned=PIN_COOKIE in request.COOKIES)
+        token = _current_request.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_request.reset(token)
+        if state.wrote and getattr(settings, 'TODO_REPLICA_DATABASE', None):
+            response.set_cookie(PIN_COOKIE, '1', max_age=getattr(settings, 'TODO_REPLICA_PIN_SECONDS', 5),
+                                httponly=True, samesite='Lax')
+        return response
+
+
+def replica_reads(view):
+    """
+    Lets the GET requests of a read-only view read from the replica.
+    """
+    def enter(request):
+        state = _current_request.get()
+        if state is not None and request.method in ('GET', 'HEAD'):
+            state.replica_view = True
+        return state
+
+    def leave(state):
+        if state is not None:
+            state.replica_view = False
+
+    if asyncio.iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            state = enter(request)
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                leave(state)
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        state = enter(request)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            leave(state)
+    return wrapper
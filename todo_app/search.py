@@ -0,0 +1,126 @@
+import re
+
+from django.db import connection
+from django.db.models import Q, F
+
+from .models import Todo, TodoArchive
+
+
+FTS_TABLE = 'todo_app_todo_fts'
+# Archived todos have an index of their own, moving a todo to the archive drops it from the first
+ARCHIVE_FTS_TABLE = 'todo_app_todoarchive_fts'
+
+# Indexed table of each index
+FTS_INDEXES = {FTS_TABLE: 'todo_app_todo', ARCHIVE_FTS_TABLE: 'todo_app_todoarchive'}
+
+
+def fts_triggers(fts_table, table):
+    """
+    Returns the triggers keeping the external content index in sync with every write of the table,
+    including bulk ones, by name.
+    """
+    return {
+        f'{fts_table}_insert': f'''
+            CREATE TRIGGER IF NOT EXISTS {fts_table}_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts_table}(rowid, title, description) VALUES (new.id, new.title, new.description);
+            END''',
+        f'{fts_table}_delete': f'''
+            CREATE TRIGGER IF NOT EXISTS {fts_table}_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts_table}({fts_table}, rowid, title, description)
+                    VALUES ('delete', old.id, old.title, old.description);
+            END''',
+        f'{fts_table}_update': f'''
+            CREATE TRIGGER IF NOT EXISTS {fts_table}_update AFTER UPDATE OF title, description
+                    ON {table} BEGIN
+                INSERT INTO {fts_table}({fts_table}, rowid, title, description)
+                    VALUES ('delete', old.id, old.title, old.description);
+                INSERT INTO {fts_table}(rowid, title, description) VALUES (new.id, new.title, new.description);
+            END''',
+    }
+
+
+def ensure_search_index(using_connection=connection):
+    """
+    Creates the FTS5 indexes of todo and archived todo titles and descriptions and their triggers
+    if they are missing.
+
+    Runs after every migrate: SQLite migrations that alter a table rebuild it and drop its
+    triggers, in which case the index is recreated from the table.
+    """
+    if using_connection.vendor != 'sqlite':
+        return
+    with using_connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name LIKE '%%_fts%%'")
+        existing = {row[0] for row in cursor.fetchall()}
+        for fts_table, table in FTS_INDEXES.items():
+            triggers = fts_triggers(fts_table, table)
+            missing = [name for name in triggers if name not in existing]
+            if fts_table in existing and not missing:
+                continue
+            cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5("
+                           f"title, description, content='{table}', content_rowid='id', "
+                           f"tokenize='unicode61 remove_diacritics 2')")
+            for name in missing:
+                cursor.execute(triggers[name])
+            cursor.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+
+
+def fts_query(text):
+    """
+    Turns user input into an FTS5 query: every word must match, the last one as a prefix.
+    """
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"' for word in words) + '*'
+
+
+def _scan(model, user, text):
+    todos = model.objects.filter(Q(user=user) | Q(group__groupuser__user=user,
+                                                  group__groupuser__status__in=['C', 'M']),
+                                 group__deleted_at__isnull=True)
+    for word in re.findall(r'\w+', text):
+        todos = todos.filter(Q(title__icontains=word) | Q(description__icontains=word))
+    return todos.annotate(group_name=F('group__name')).values(*TodoArchive.ARCHIVED_FIELDS, 'group_name')
+
+
+def _matches(fts_table, table):
+    # Title matches weigh twice as much as description matches
+    return f'''
+        SELECT {', '.join(f't.{field}' for field in TodoArchive.ARCHIVED_FIELDS)}, g.name AS group_name,
+               bm25({fts_table}, 2.0, 1.0) AS rank
+        FROM {fts_table} f
+        JOIN {table} t ON t.id = f.rowid
+        LEFT JOIN todo_app_group g ON g.id = t.group_id
+        WHERE {fts_table} MATCH %s AND g.deleted_at IS NULL AND (t.user_id = %s OR t.group_id IN (
+            SELECT group_id FROM todo_app_groupuser WHERE user_id = %s AND status IN ('C', 'M')))'''
+
+
+def search_todos(user, text, page=1, page_size=20):
+    """
+    Returns (todos, has next page) of the user's own and group todos matching text, archived ones
+    included, best matches first. Every todo gets a group_name attribute.
+    """
+    query = fts_query(text)
+    if query is None:
+        return [], False
+
+    if connection.vendor != 'sqlite':
+        # No FTS5 outside SQLite, fall back to a scan
+        rows = _scan(Todo, user, text).union(_scan(TodoArchive, user, text)).order_by('-creation_time', '-id')
+        todos = []
+        for row in rows[(page - 1) * page_size:page * page_size + 1]:
+            group_name = row.pop('group_name')
+            todo = Todo(**row)
+            todo.group_name = group_name
+            todos.append(todo)
+        return todos[:page_size], len(todos) > page_size
+
+    # Ranking has to score every match anyway, so an OFFSET adds little on top. Archived todos come
+    # as Todo instances, view_todo shows them by their id.
+    todos = list(Todo.objects.raw(f'''
+        SELECT * FROM ({_matches(FTS_TABLE, 'todo_app_todo')}
+                       UNION ALL {_matches(ARCHIVE_FTS_TABLE, 'todo_app_todoarchive')})
+        ORDER BY rank, id LIMIT %s OFFSET %s''',
+        [query, user.pk, user.pk, query, user.pk, user.pk, page_size + 1, (page - 1) * page_size]))
+    return todos[:page_size], len(todos) > page_size
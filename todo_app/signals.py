@@ -0,0 +1,92 @@
+from functools import partial
+
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .caching import invalidate_lists, invalidate_todo_lists, invalidate_invites, invalidate_user
+from .counters import apply_changes
+from .events import broker, todo_event_data
+from .models import Todo, Group, GroupUser
+
+
+@receiver(pre_save, sender=Todo)
+def remember_todo_state(sender, instance, **kwargs):
+    instance._previous_state = None
+    if instance.pk is not None:
+        previous = Todo.objects.filter(pk=instance.pk) \
+            .values_list('group', 'completion_time', 'importance', 'due_time').first()
+        if previous is not None:
+            instance._previous_state = previous[:3]
+            if previous[3] != instance.due_time:
+                # A new due time gets its own reminder
+                instance.reminder_sent_at = None
+    instance._previous_group_id = instance._previous_state[0] if instance._previous_state else None
+
+
+@receiver(post_save, sender=Todo)
+@receiver(post_delete, sender=Todo)
+def invalidate_todo_owner_lists(sender, instance, **kwargs):
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    invalidate_todo_lists([instance.user_id], [instance.group_id, previous_group_id])
+
+
+@receiver(post_save, sender=Todo)
+def count_todo_saved(sender, instance, **kwargs):
+    apply_changes([(instance.user_id, getattr(instance, '_previous_state', None),
+                    (instance.group_id, instance.completion_time, instance.importance))])
+
+
+@receiver(post_delete, sender=Todo)
+def count_todo_deleted(sender, instance, **kwargs):
+    apply_changes([(instance.user_id, (instance.group_id, instance.completion_time, instance.importance), None)])
+
+
+@receiver(post_save, sender=Todo)
+def publish_todo_saved(sender, instance, created, **kwargs):
+    data = todo_event_data(instance)
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    if previous_group_id is not None and previous_group_id != instance.group_id:
+        transaction.on_commit(partial(broker.publish, previous_group_id, 'deleted', data))
+    if instance.group_id is None:
+        return
+    if instance.completion_time is not None:
+        event_type = 'completed'
+    elif created or previous_group_id != instance.group_id:
+        event_type = 'created'
+    else:
+        event_type = 'edited'
+    transaction.on_commit(partial(broker.publish, instance.group_id, event_type, data))
+
+
+@receiver(post_delete, sender=Todo)
+def publish_todo_deleted(sender, instance, **kwargs):
+    if instance.group_id is not None:
+        transaction.on_commit(partial(broker.publish, instance.group_id, 'deleted', todo_event_data(instance)))
+
+
+@receiver(post_save, sender=GroupUser)
+@receiver(post_delete, sender=GroupUser)
+def invalidate_membership_lists(sender, instance, **kwargs):
+    invalidate_lists([instance.user_id])
+    invalidate_invites(instance.user_id)
+
+
+@receiver(post_save, sender=Group)
+def invalidate_group_lists(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_todo_lists([], [instance.pk])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def invalidate_logged_out_user(sender, request, user, **kwargs):
+    if user is not None:
+        invalidate_user(user.pk)
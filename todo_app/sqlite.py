@@ -0,0 +1,15 @@
+from django.conf import settings
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    """
+    Runs settings.TODO_SQLITE_PRAGMAS on every new SQLite connection.
+
+    Goes through the raw connection, so the pragmas don't count as queries of the request that
+    happened to open the connection.
+    """
+    pragmas = getattr(settings, 'TODO_SQLITE_PRAGMAS', {})
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    for name, value in pragmas.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,142 @@
+"""
+Static file pipeline: hashed and precompressed files written by collectstatic, served from
+STATIC_ROOT with far-future caching, and third-party assets vendored into static/vendor.
+"""
+import functools
+import gzip
+import mimetypes
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.checks import Warning, register
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse
+from django.utils._os import safe_join
+from django.utils.functional import cached_property
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Name: (path under static/, URL the vendor_assets command downloads it from, Subresource Integrity
+# hash of the file)
+VENDOR_ASSETS = {
+    'bootstrap.css': ('vendor/bootstrap-4.5.0.min.css',
+                      'https://stackpath.bootstrapcdn.com/bootstrap/4.5.0/css/bootstrap.min.css',
+                      'sha384-9aIt2nRpC12Uk9gS9baDl411NQApFmC26EwAOH8WgZl5MYYxFfc+NcPb1dKGj7Sk'),
+    'jquery.js': ('vendor/jquery-3.5.1.slim.min.js',
+                  'https://code.jquery.com/jquery-3.5.1.slim.min.js',
+                  'sha384-DfXdz2htPH0lsSSs5nCTpuj/zy4C+OGpamoFVy38MVBnE+IbbVYUew+OrCXaRkfj'),
+    'popper.js': ('vendor/popper-1.16.0.min.js',
+                  'https://cdn.jsdelivr.net/npm/popper.js@1.16.0/dist/umd/popper.min.js',
+                  'sha384-Q6E9RHvbIyZFJoft+2mJbHaEWldlvI9IOYy5n3zV9zzTtmI3UksdQRVvoxMfooAo'),
+    'bootstrap.js': ('vendor/bootstrap-4.5.0.min.js',
+                     'https://stackpath.bootstrapcdn.com/bootstrap/4.5.0/js/bootstrap.min.js',
+                     'sha384-OgVRvuATP1z7JjHLkuOU7Xw704+h835Lr+6QL9UvYjZE3Ipu6Tp75j7Bh/kR0JKI'),
+}
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.txt', '.html', '.json', '.map', '.xml')
+
+# (file suffix, Content-Encoding) of the precompressed variants, preferred first
+ENCODINGS = (('.br', 'br'), ('.gz', 'gzip'))
+
+
+@functools.lru_cache(maxsize=None)
+def is_vendored(path):
+    return finders.find(path) is not None
+
+
+@register()
+def check_vendor_assets(app_configs, **kwargs):
+    return [Warning(f'{path} is missing, pages load it without a fallback',
+                    hint='Run manage.py vendor_assets and commit static/vendor', id='todo_app.W001')
+            for path, _, _ in VENDOR_ASSETS.values() if not is_vendored(path)]
+
+
+def _compressors():
+    compressors = [('.gz', lambda data: gzip.compress(data, 9, mtime=0))]
+    if brotli is not None:
+        compressors.insert(0, ('.br', brotli.compress))
+    return compressors
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Adds a content hash to every collected file name and writes .gz variants of the text files next
+    to the hashed files, .br variants too when the brotli package is installed.
+    """
+    def stored_name(self, name):
+        if not self.hashed_files:
+            # Nothing collected yet (development, tests): files keep their own names
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in set(self.hashed_files.values()):
+            if name.endswith(COMPRESSIBLE):
+                self.compress(name)
+
+    def compress(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as file:
+            data = file.read()
+        for suffix, compress in _compressors():
+            compressed = compress(data)
+            # Not worth a second request path when it barely shrinks
+            if len(compressed) < len(data) * 0.95:
+                with open(path + suffix, 'wb') as file:
+                    file.write(compressed)
+
+
+class StaticFilesMiddleware:
+    """
+    Serves collected files from STATIC_ROOT before the rest of the stack runs, as the precompressed
+    variant the client accepts. Hashed names never change content and are cached for a year, other
+    files for TODO_STATIC_MAX_AGE seconds.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.root = settings.STATIC_ROOT
+        self.prefix = settings.STATIC_URL
+
+    @cached_property
+    def hashed_names(self):
+        return set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+    def __call__(self, request):
+        if self.root and request.method in ('GET', 'HEAD') and request.path.startswith(self.prefix):
+            response = self.serve(request, request.path[len(self.prefix):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request, name):
+        try:
+            path = safe_join(self.root, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        accepted = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        variants = [(path + suffix, encoding) for suffix, encoding in ENCODINGS if os.path.isfile(path + suffix)]
+        served, encoding = next(((variant, encoding) for variant, encoding in variants if encoding in accepted),
+                                (path, None))
+        response = FileResponse(open(served, 'rb'), filename=os.path.basename(path),
+                                content_type=mimetypes.guess_type(path)[0] or 'application/octet-stream')
+        if encoding is not None:
+            response['Content-Encoding'] = encoding
+        if variants:
+            response['Vary'] = 'Accept-Encoding'
+        if name in self.hashed_names:
+            response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        else:
+            response['Cache-Control'] = f"public, max-age={getattr(settings, 'TODO_STATIC_MAX_AGE', 60)}"
+        return response
@@ -0,0 +1,22 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html
+
+from todo_app.static import VENDOR_ASSETS
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def vendor_asset(name):
+    """
+    Renders the <link> or <script> tag of a third-party asset in static/vendor, where the
+    vendor_assets command puts it. There is no CDN fallback: a missing file is reported by the
+    todo_app.W001 check, and fails the page once collectstatic wrote the manifest.
+    """
+    path, _, integrity = VENDOR_ASSETS[name]
+    url = static(path)
+    if name.endswith('.css'):
+        return format_html('<link rel="stylesheet" href="{}" integrity="{}">', url, integrity)
+    return format_html('<script src="{}" integrity="{}"></script>', url, integrity)
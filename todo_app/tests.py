@@ -1,6 +1,43 @@
-from django.test import TestCase, Client
+import gzip
+import importlib
+import json
+import os
+import re
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.apps import apps
+from django.db import connection, transaction, IntegrityError
+from django.db.backends.sqlite3.base import DatabaseWrapper as SqliteDatabaseWrapper
 from django.contrib.auth.models import User
-from todo_app.models import Todo, GroupUser, Group
+from django.utils import timezone
+from todo_app.models import Todo, TodoArchive, TodoCounter, TodoEvent, GroupUser, Group, Job
+from todo_app.datagen import generate
+from todo_app.search import ensure_search_index, search_todos
+from todo_app import async_views, datagen, events
+from todo_app.metrics import registry
+from todo_app.fragments import render_rows, row_key
+from todo_app.caching import list_key, user_key
+from todo_app.sqlite import apply_pragmas
+from todo_app.routers import PIN_COOKIE
+from todo_app.counters import count_todos, counts_key, get_counts
+from todo_app.static import check_vendor_assets, is_vendored
+from todo_app.reminders import pending_reminders
+from todo_app.management.commands.archive_todos import candidates as archive_candidates
+from todo_app import jobs
+from todo_app.metrics import job_registry
 
 
 # Create your tests here.
@@ -47,6 +84,19 @@ class UserAuthorizationCase(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertRedirects(response, '/current/')
 
+    def test_signup_email(self):
+        response = self.client.post(
+            '/signup/',
+            {'username': 'Vasek', 'email': 'vasek', 'password1': '1234', 'password2': '1234'}
+        )
+        self.assertContains(response, "Please, enter a valid email address")
+        self.assertFalse(User.objects.exists())
+        self.client.post(
+            '/signup/',
+            {'username': 'Vasek', 'email': 'vasek@example.com', 'password1': '1234', 'password2': '1234'}
+        )
+        self.assertEqual(User.objects.get().email, 'vasek@example.com')
+
     def test_taken_name_signup(self):
         self.client.post(
             '/signup/',
@@ -104,9 +154,16 @@ class ModelTestsCase(TestCase):
         group.save()
         self.assertEqual(len(group.users.all()), 1)
 
+    def test_group_user_unique(self):
+        group = Group.objects.create(name='testgroup')
+        GroupUser.objects.create(user=self.user, group=group, status='C')
+        with self.assertRaises(IntegrityError):
+            GroupUser.objects.create(user=self.user, group=group, status='I')
+
 
 class CreateActionsCase(TestCase):
     def setUp(self) -> None:
+        cache.clear()
         self.client = Client()
         self.client.post(
             '/signup/',
@@ -134,6 +191,7 @@ class CreateActionsCase(TestCase):
 
 class TodoActionsCase(TestCase):
     def setUp(self) -> None:
+        cache.clear()
         self.client = Client()
         self.client.post(
             '/signup/',
@@ -187,6 +245,7 @@ class TodoActionsCase(TestCase):
 
 class GroupActionsCase(TestCase):
     def setUp(self) -> None:
+        cache.clear()
         self.client = Client()
         self.client.post(
             '/signup/',
@@ -221,18 +280,1501 @@ class GroupActionsCase(TestCase):
         )
         response_acceptance = self.client.post(
             '/groups/accept/',
-            {'group': self.group.name, 'next': '/groups/'},
+            {'group': self.group.pk, 'next': '/groups/'},
             follow=True
         )
         self.assertRedirects(response_acceptance, '/groups/')
         self.assertContains(response_acceptance, 'TestGroup')
 
 
+class CurrentTodosQueriesCase(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='Vasek', password='1234')
+        self.other = User.objects.create_user(username='Test', password='1234')
+        self.client.force_login(self.user)
+        Todo.objects.create(title='own todo', user=self.user)
+
+    def add_groups(self, count):
+        for i in range(count):
+            group = Group.objects.create(name=f'group{Group.objects.count()}')
+            GroupUser.objects.create(group=group, user=self.user, status='C' if i % 2 else 'M')
+            GroupUser.objects.create(group=group, user=self.other, status='M')
+            Todo.objects.create(title=f'{group.name} todo', user=self.other, group=group)
+
+    def current_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/current/')
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_query_count_is_flat(self):
+        self.add_groups(1)
+        self.current_queries()  # caches the session user
+        self.add_groups(1)
+        queries = self.current_queries()
+
+        self.add_groups(98)
+        with self.assertNumQueries(queries):
+            response = self.client.get('/current/')
+        self.assertContains(response, 'own todo')
+        self.assertContains(response, 'group0 todo')
+        self.assertContains(response, 'group99 todo')
+
+    def test_groups_with_same_name(self):
+        for title in ('first', 'second'):
+            group = Group.objects.create(name='same')
+            GroupUser.objects.create(group=group, user=self.user, status='M')
+            Todo.objects.create(title=f'{title} todo', user=self.other, group=group)
+
+        response = self.client.get('/current/')
+        self.assertContains(response, 'first todo')
+        self.assertContains(response, 'second todo')
+
+    def test_invited_and_completed_todos_hidden(self):
+        group = Group.objects.create(name='invited')
+        GroupUser.objects.create(group=group, user=self.user, status='I')
+        Todo.objects.create(title='invited todo', user=self.other, group=group)
+        Todo.objects.create(title='done todo', user=self.user, completion_time=timezone.now())
+
+        response = self.client.get('/current/')
+        self.assertNotContains(response, 'invited todo')
+        self.assertNotContains(response, 'done todo')
+
+
+class ListCacheCase(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='Vasek', password='1234')
+        self.other = User.objects.create_user(username='Test', password='1234')
+        self.client.force_login(self.user)
+        self.group = Group.objects.create(name='TestGroup')
+        GroupUser.objects.create(group=self.group, user=self.user, status='C')
+        GroupUser.objects.create(group=self.group, user=self.other, status='M')
+        self.todo = Todo.objects.create(title='own todo', user=self.user)
+
+    def queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_hit_skips_list_queries(self):
+        for url in ('/current/', '/completed/'):
+            miss = self.queries(url)
+            hit = self.queries(url)
+            self.assertLess(hit, miss)
+
+    def test_private_cache_keeps_seconds(self):
+        for shared, timeout in ((False, 5), (True, 300)):
+            cache.clear()
+            with override_settings(TODO_SHARED_CACHE=shared), mock.patch('todo_app.caching.cache.set',
+                                                                          wraps=cache.set) as cache_set:
+                self.client.get('/current/')
+            timeouts = {call.args[0].split(':')[1]: call.args[2] for call in cache_set.call_args_list
+                        if call.args[0].startswith(('todo_app:lists:', 'todo_app:invites:', 'todo_app:counts:'))}
+            self.assertEqual(timeouts['lists'], timeout)
+            self.assertEqual(timeouts['invites'], timeout)
+            self.assertEqual(timeouts['counts'], timeout)
+
+    def test_own_todo_change_invalidates(self):
+        self.client.get('/current/')
+        self.todo.title = 'renamed todo'
+        self.todo.save()
+        self.assertContains(self.client.get('/current/'), 'renamed todo')
+
+        self.client.get('/completed/')
+        self.client.post(f'/todo/{self.todo.pk}/complete/')
+        self.assertContains(self.client.get('/completed/'), 'renamed todo')
+        self.assertNotContains(self.client.get('/current/'), 'renamed todo')
+
+    def test_group_todo_change_invalidates_members(self):
+        self.client.get('/current/')
+        Todo.objects.create(title='group todo', user=self.other, group=self.group)
+        self.assertContains(self.client.get('/current/'), 'group todo')
+
+    def test_todo_moved_out_of_group_invalidates_members(self):
+        todo = Todo.objects.create(title='moving todo', user=self.other, group=self.group)
+        self.assertContains(self.client.get('/current/'), 'moving todo')
+        todo.group = None
+        todo.save()
+        self.assertNotContains(self.client.get('/current/'), 'moving todo')
+
+    def test_membership_change_invalidates(self):
+        group = Group.objects.create(name='OtherGroup')
+        Todo.objects.create(title='other group todo', user=self.other, group=group)
+        membership = GroupUser.objects.create(group=group, user=self.user, status='I')
+        self.assertNotContains(self.client.get('/current/'), 'other group todo')
+
+        membership.status = 'M'
+        membership.save()
+        self.assertContains(self.client.get('/current/'), 'other group todo')
+
+        membership.delete()
+        self.assertNotContains(self.client.get('/current/'), 'other group todo')
+
+
+class RowFragmentCacheCase(TestCase):
+    TEMPLATE = 'todo_app/rows/current_todo.html'
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create_user(username='Vasek', password='1234')
+        self.todo = Todo.objects.create(title='cached row', user=self.user)
+
+    def test_rows_rendered_once_per_version(self):
+        render_rows([self.todo], self.TEMPLATE)
+        self.assertIn('cached row', cache.get(row_key(self.TEMPLATE, self.todo)))
+        with mock.patch('todo_app.fragments.render_to_string') as render_to_string:
+            todos = render_rows([Todo.objects.get(pk=self.todo.pk)], self.TEMPLATE)
+        render_to_string.assert_not_called()
+        self.assertIn('cached row', todos[0].row_html)
+
+    def test_edit_renders_new_version(self):
+        render_rows([self.todo], self.TEMPLATE)
+        self.todo.title = 'edited row'
+        self.todo.save()
+        todos = render_rows([Todo.objects.get(pk=self.todo.pk)], self.TEMPLATE)
+        self.assertIn('edited row', todos[0].row_html)
+
+    def test_bulk_completion_renders_new_version(self):
+        client = Client()
+        client.force_login(self.user)
+        client.get('/completed/')
+        client.post('/api/todos/bulk/', json.dumps({'complete': [self.todo.pk]}), content_type='application/json')
+        self.assertContains(client.get('/completed/'), 'cached row')
+
+    def test_relative_time_rendered_by_browser(self):
+        client = Client()
+        client.force_login(self.user)
+        response = client.get('/current/')
+        self.assertContains(response, f'datetime="{timezone.localtime(self.todo.creation_time).isoformat()}" data-relative')
+        self.assertContains(response, 'time[data-relative]')
+
+
+@override_settings(TODO_SHARED_CACHE=True, SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+class SessionUserCacheCase(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create_user(username='Vasek', password='1234')
+        Todo.objects.create(title='own todo', user=self.user)
+
+    def logged_in_client(self):
+        client = Client()
+        client.force_login(self.user)
+        client.get('/current/')
+        return client
+
+    def test_no_queries_in_steady_state(self):
+        for engine in ('cached_db', 'signed_cookies'):
+            with self.subTest(engine=engine), \
+                    override_settings(SESSION_ENGINE=f'django.contrib.sessions.backends.{engine}'):
+                client = self.logged_in_client()
+                with self.assertNumQueries(0):
+                    response = client.get('/current/')
+                self.assertContains(response, 'own todo')
+
+    def test_password_change_ends_sessions(self):
+        client = self.logged_in_client()
+        self.user.set_password('4321')
+        self.user.save()
+        self.assertIsNone(cache.get(user_key(self.user.pk)))
+        self.assertRedirects(client.get('/current/'), '/login/?next=/current/', fetch_redirect_response=False)
+
+    def test_private_cache_not_used(self):
+        with override_settings(TODO_SHARED_CACHE=False, SESSION_ENGINE='django.contrib.sessions.backends.db'):
+            client = self.logged_in_client()
+            self.assertIsNone(cache.get(user_key(self.user.pk)))
+            # Sessions of ModelBackend from before the cached user stay logged in
+            client.force_login(self.user, backend='django.contrib.auth.backends.ModelBackend')
+            self.assertContains(client.get('/current/'), 'own todo')
+
+    def test_logout_drops_cached_user(self):
+        client = self.logged_in_client()
+        self.assertIsNotNone(cache.get(user_key(self.user.pk)))
+        client.post('/logout/')
+        self.assertIsNone(cache.get(user_key(self.user.pk)))
+
+
+@override_settings(TODO_PAGE_SIZE=3)
+class KeysetPaginationCase(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='Vasek', password='1234')
+        self.client.force_login(self.user)
+        self.group = Group.objects.create(name='TestGroup')
+        GroupUser.objects.create(group=self.group, user=self.user, status='C')
+
+    def create_todos(self, prefix, count, **kwargs):
+        # Same timestamps make the pk the only tie-breaker
+        now = timezone.now()
+        todos = [Todo.objects.create(title=f'{prefix} {i}', user=self.user, **kwargs) for i in range(count)]
+        Todo.objects.filter(pk__in=[todo.pk for todo in todos]).update(creation_time=now)
+        return todos
+
+    def follow(self, url):
+        titles = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            titles.extend(todo.title for todo in response.context['todos'])
+            url = f"/completed/?after={response.context['cursor']}" if response.context['cursor'] else None
+        return titles
+
+    def test_completed_pages(self):
+        todos = self.create_todos('done', 8, completion_time=timezone.now())
+        titles = self.follow('/completed/')
+        self.assertEqual(titles, [todo.title for todo in reversed(todos)])
+
+    def test_current_lists_pages(self):
+        self.create_todos('own', 4)
+        group_todos = self.create_todos('group', 5, group=self.group)
+
+        response = self.client.get('/current/')
+        self.assertEqual(len(response.context['user_todos']), 3)
+        group, page, cursor = response.context['group_todos'][0]
+        self.assertEqual(len(page), 3)
+
+        response = self.client.get(f'/current/?after={response.context["user_cursor"]}')
+        self.assertEqual([todo.title for todo in response.context['user_todos']], ['own 0'])
+        self.assertIsNone(response.context['user_cursor'])
+
+        response = self.client.get(f'/current/?after={cursor}')
+        group, page, cursor = response.context['group_todos'][0]
+        self.assertEqual([todo.title for todo in page], [todo.title for todo in reversed(group_todos[:2])])
+        self.assertIsNone(cursor)
+
+    def test_foreign_group_cursor(self):
+        self.create_todos('group', 5, group=self.group)
+        cursor = self.client.get('/current/').context['group_todos'][0][2]
+        GroupUser.objects.filter(user=self.user).delete()
+        self.assertEqual(self.client.get(f'/current/?after={cursor}').status_code, 404)
+
+    def test_bad_cursor(self):
+        self.assertEqual(self.client.get('/completed/?after=garbage').status_code, 400)
+        self.assertEqual(self.client.get('/current/?after=garbage').status_code, 400)
+
+
+class InvitesBadgeCase(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='Vasek', password='1234')
+        self.group = Group.objects.create(name='TestGroup')
+
+    def groupuser_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        return response, [query['sql'] for query in context.captured_queries if 'todo_app_groupuser' in query['sql']]
+
+    def test_anonymous_page_has_no_queries(self):
+        with self.assertNumQueries(0):
+            self.client.get('/')
+
+    def test_count_is_cached_and_invalidated(self):
+        self.client.force_login(self.user)
+        response, queries = self.groupuser_queries('/')
+        self.assertEqual(len(queries), 1)
+        self.assertContains(response, 'Invites')
+
+        response, queries = self.groupuser_queries('/')
+        self.assertEqual(queries, [])
+
+        GroupUser.objects.create(group=self.group, user=self.user, status='I')
+        response, queries = self.groupuser_queries('/')
+        self.assertEqual(len(queries), 2)
+        self.assertContains(response, 'Invites (1)')
+        self.assertContains(response, 'TestGroup - Принять')
+
+
+@override_settings(TODO_SHARED_CACHE=True, SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+class BulkApiCase(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='Vasek', password='1234')
+        self.other = User.objects.create_user(username='Test', password='1234')
+        self.client.force_login(self.user)
+        self.group = Group.objects.create(name='TestGroup')
+        GroupUser.objects.create(group=self.group, user=self.user, status='M')
+        self.foreign_group = Group.objects.create(name='ForeignGroup')
+
+    def post(self, payload):
+        return self.client.post('/api/todos/bulk/', json.dumps(payload), content_type='application/json')
+
+    def test_create(self):
+        items = [{'title': f'todo {i}', 'importance': i % 2 == 0} for i in range(50)]
+        items.append({'title': 'group todo', 'group': self.group.pk})
+        response = self.post({'create': items})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 51)
+        self.assertEqual(Todo.objects.filter(user=self.user).count(), 51)
+        self.assertEqual(Todo.objects.get(title='group todo').group, self.group)
+
+    def test_create_is_atomic(self):
+        response = self.post({'create': [{'title': 'ok'}, {'title': ''}, {'title': 'x', 'group': self.foreign_group.pk}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()['errors']), {'1', '2'})
+        self.assertFalse(Todo.objects.exists())
+
+    def test_complete_and_delete(self):
+        todos = [Todo.objects.create(title=f'todo {i}', user=self.user) for i in range(6)]
+        self.client.get('/current/')
+        with self.assertNumQueries(7):
+            # savepoint, select + update, select + delete, counter update, release
+            response = self.post({'complete': [todo.pk for todo in todos[:3]],
+                                  'delete': [todo.pk for todo in todos[3:]]})
+        self.assertEqual(response.json(), {'created': 0, 'completed': 3, 'deleted': 3, 'ids': []})
+        self.assertEqual(Todo.objects.filter(completion_time__isnull=False).count(), 3)
+        self.assertEqual(Todo.objects.count(), 3)
+        self.assertNotContains(self.client.get('/current/'), 'todo 0')
+        self.assertEqual(get_counts(user_id=self.user.pk), {'open': 0, 'completed': 3, 'important': 0})
+
+    def test_group_deletes_take_one_delete(self):
+        todos = Todo.objects.bulk_create([Todo(title=f'group todo {i}', user=self.user, group=self.group)
+                                          for i in range(100)])
+        ids = list(Todo.objects.filter(group=self.group).values_list('pk', flat=True))
+        self.assertEqual(len(ids), len(todos))
+        get_counts(group_id=self.group.pk)
+        self.client.get('/current/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post({'delete': ids})
+        self.assertEqual(response.json()['deleted'], 100)
+        self.assertEqual(sum(query['sql'].startswith('DELETE') for query in queries), 1)
+        self.assertLess(len(queries), 10)
+        self.assertEqual(get_counts(group_id=self.group.pk)['open'], 0)
+
+    def test_csrf_token_flow(self):
+        client = Client(enforce_csrf_checks=True)
+        client.get('/login/')
+        client.post('/login/', {'username': 'Vasek', 'password': '1234',
+                                'csrfmiddlewaretoken': client.cookies['csrftoken'].value})
+        body = json.dumps({'create': [{'title': 'from an integration'}]})
+        response = client.post('/api/todos/bulk/', body, content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+        response = client.post('/api/todos/bulk/', body, content_type='application/json',
+                               HTTP_X_CSRFTOKEN=client.cookies['csrftoken'].value)
+        self.assertEqual(response.json()['created'], 1)
+
+    def test_foreign_todo_rolls_back(self):
+        own = Todo.objects.create(title='own', user=self.user)
+        foreign = Todo.objects.create(title='foreign', user=self.other)
+        response = self.post({'create': [{'title': 'new'}], 'complete': [own.pk], 'delete': [foreign.pk]})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['ids'], [foreign.pk])
+        self.assertFalse(Todo.objects.filter(title='new').exists())
+        self.assertIsNone(Todo.objects.get(pk=own.pk).completion_time)
+        self.assertTrue(Todo.objects.filter(pk=foreign.pk).exists())
+
+    def test_errors(self):
+        self.assertEqual(self.client.get('/api/todos/bulk/').status_code, 405)
+        self.assertEqual(self.client.post('/api/todos/bulk/', 'nope', content_type='application/json').status_code, 400)
+        self.assertEqual(self.post({'complete': ['1']}).status_code, 400)
+        self.client.logout()
+        self.assertEqual(self.post({'complete': [1]}).status_code, 401)
+
+
+class DataGenerationCase(TestCase):
+    def test_generate(self):
+        users, groups = generate(users=6, groups=3, members=4, todos=200, completed=0.5, seed=1, prefix='a')
+        self.assertEqual(len(users), 6)
+        self.assertEqual(GroupUser.objects.filter(group__in=groups).count(), 12)
+        self.assertEqual(GroupUser.objects.filter(group__in=groups, status='C').count(), 3)
+        self.assertEqual(Todo.objects.filter(user__in=users).count(), 200)
+        self.assertLess(Todo.objects.order_by('creation_time').first().creation_time,
+                        timezone.now() - timedelta(days=1))
+        self.assertTrue(Todo._meta.get_field('creation_time').auto_now_add)
+
+    def test_generate_updates_counters(self):
+        apply_changes = datagen.apply_changes
+
+        def read_counters_once(changes):
+            apply_changes(changes)
+            if read_counters_once.first:
+                # A reader creates the counters after the first chunk
+                read_counters_once.first = False
+                for user_id in User.objects.values_list('pk', flat=True):
+                    get_counts(user_id=user_id)
+                for group_id in Group.objects.values_list('pk', flat=True):
+                    get_counts(group_id=group_id)
+        read_counters_once.first = True
+
+        with mock.patch.object(datagen, 'apply_changes', side_effect=read_counters_once):
+            users, groups = generate(users=4, groups=2, members=3, todos=100, seed=2, chunk_size=30)
+        cache.clear()
+        for user_id in users:
+            self.assertEqual(get_counts(user_id=user_id), count_todos(user_id, None))
+        for group_id in groups:
+            self.assertEqual(get_counts(group_id=group_id), count_todos(None, group_id))
+
+    def test_generate_is_reproducible(self):
+        generate(users=5, groups=2, todos=100, seed=3, prefix='a')
+        generate(users=5, groups=2, todos=100, seed=3, prefix='b')
+        first = Todo.objects.filter(title__startswith='a ').order_by('pk')
+        second = Todo.objects.filter(title__startswith='b ').order_by('pk')
+        self.assertEqual([(todo.importance, todo.completion_time is None) for todo in first],
+                         [(todo.importance, todo.completion_time is None) for todo in second])
+
+    def test_loadtest(self):
+        generate(users=3, groups=2, members=3, todos=60, seed=1)
+        out = StringIO()
+        call_command('loadtest', requests=50, stdout=out)
+        self.assertIn('current_todos', out.getvalue())
+        self.assertIn('req/s', out.getvalue())
+        self.assertEqual(Todo.objects.count(), 60)
+
+
+# The views read on pool threads, with connections of their own that see committed rows only
+class AsyncViewsCase(TransactionTestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user(username='Vasek', password='1234')
+        self.other = User.objects.create_user(username='Test', password='1234')
+        self.group = Group.objects.create(name='TestGroup')
+        GroupUser.objects.create(group=self.group, user=self.user, status='C')
+        GroupUser.objects.create(group=self.group, user=self.other, status='M')
+        self.todo = Todo.objects.create(title='own todo', user=self.user)
+        self.group_todo = Todo.objects.create(title='group todo', user=self.other, group=self.group)
+        Todo.objects.create(title='done todo', user=self.user, completion_time=timezone.now())
+
+    def get(self, view, path, *args, user=None):
+        request = self.factory.get(path)
+        request.user = user or self.user
+        return async_to_sync(view)(request, *args)
+
+    def test_lists(self):
+        response = self.get(async_views.current_todos, '/current/')
+        self.assertContains(response, 'own todo')
+        self.assertContains(response, 'group todo')
+        self.assertContains(self.get(async_views.completed_todos, '/completed/'), 'done todo')
+        self.assertEqual(self.get(async_views.completed_todos, '/completed/?after=bad').status_code, 400)
+
+    def test_view_todo(self):
+        self.assertContains(self.get(async_views.view_todo, '/todo/', self.group_todo.pk), 'group todo')
+        stranger = User.objects.create_user(username='Stranger', password='1234')
+        with self.assertRaises(Http404):
+            self.get(async_views.view_todo, '/todo/', self.todo.pk, user=stranger)
+
+    def test_groups(self):
+        self.assertContains(self.get(async_views.groups, '/groups/'), 'TestGroup')
+        response = self.get(async_views.group, '/groups/', self.group.pk)
+        self.assertContains(response, 'Vasek')
+        self.assertContains(response, 'Test')
+
+    def test_anonymous_redirect(self):
+        response = self.get(async_views.current_todos, '/current/', user=AnonymousUser())
+        self.assertEqual(response.status_code, 302)
+
+    def test_not_modified(self):
+        request = self.factory.get('/current/')
+        request.user = self.user
+        response = async_to_sync(async_views.current_todos)(request)
+        csrf_cookie = request.META['CSRF_COOKIE']
+        request = self.factory.get('/current/', HTTP_IF_NONE_MATCH=response['ETag'])
+        request.user = self.user
+        # Set from the cookie by CsrfViewMiddleware
+        request.META['CSRF_COOKIE'] = csrf_cookie
+        self.assertEqual(async_to_sync(async_views.current_todos)(request).status_code, 304)
+
+
+class EventBrokerCase(TestCase):
+    def setUp(self) -> None:
+        self.broker = events.EventBroker(history=3)
+
+    def test_wait_filters_groups(self):
+        since = self.broker.last_id
+        self.broker.publish(1, 'created', {'id': 1})
+        self.broker.publish(2, 'created', {'id': 2})
+        found, missed, last_id = self.broker.wait({2}, since, timeout=0)
+        self.assertEqual([event[3] for event in found], [{'id': 2}])
+        self.assertFalse(missed)
+        self.assertEqual(last_id, since + 2)
+
+    def test_wait_times_out(self):
+        since = self.broker.last_id
+        self.assertEqual(self.broker.wait({1}, since, timeout=0.01), ([], False, since))
+
+    def test_missed_events(self):
+        since = self.broker.last_id
+        for i in range(5):
+            self.broker.publish(1, 'edited', {'id': i})
+        self.assertEqual(TodoEvent.objects.count(), 3)
+        self.assertTrue(self.broker.wait({1}, since + 1, timeout=0)[1])
+        self.assertEqual(len(self.broker.wait({1}, since + 2, timeout=0)[0]), 3)
+
+    def test_events_of_other_processes(self):
+        since = self.broker.last_id
+        # Written by another worker, this process is not notified
+        TodoEvent.objects.create(group_id=1, event_type='edited', data='{"id": 1}')
+        with override_settings(TODO_EVENTS_POLL=0.01):
+            found, missed, last_id = self.broker.wait({1}, since, timeout=1)
+        self.assertEqual([event[2:] for event in found], [('edited', {'id': 1})])
+
+
+@override_settings(TODO_EVENTS_HEARTBEAT=0.01, TODO_EVENTS_STREAM_TIMEOUT=0.05)
+class EventStreamCase(TestCase):
+    def setUp(self) -> None:
+        self.client = Client()
+        self.user = User.objects.create_user(username='Vasek', password='1234')
+        self.client.force_login(self.user)
+        self.group = Group.objects.create(name='TestGroup')
+        GroupUser.objects.create(group=self.group, user=self.user, status='M')
+        self.foreign_group = Group.objects.create(name='ForeignGroup')
+        self.broker = events.EventBroker()
+        patcher = mock.patch.object(events, 'broker', self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def stream(self, url, **headers):
+        response = self.client.get(url, **headers)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return b''.join(response.streaming_content).decode()
+
+    def test_resume_from_last_event_id(self):
+        self.broker.publish(self.group.pk, 'created', {'id': 1})
+        first = self.broker.last_id
+        self.broker.publish(self.foreign_group.pk, 'created', {'id': 2})
+        self.broker.publish(self.group.pk, 'edited', {'id': 3})
+        body = self.stream('/events/', HTTP_LAST_EVENT_ID=str(first))
+        self.assertIn(f'id: {first + 2}\nevent: edited\ndata: {{"id": 3}}', body)
+        self.assertNotIn('"id": 1}', body)
+        self.assertNotIn('"id": 2}', body)
+        self.assertIn(': heartbeat', body)
+
+    def test_new_connection_skips_history(self):
+        self.broker.publish(self.group.pk, 'created', {'id': 1})
+        body = self.stream(f'/groups/{self.group.pk}/events/')
+        self.assertNotIn('event:', body)
+        self.assertIn('retry: 3000', body)
+
+    def test_unknown_event_id_reloads(self):
+        last_id = str(self.broker.last_id + 100)
+        self.assertIn('event: reload', self.stream('/events/', HTTP_LAST_EVENT_ID=last_id))
+
+    def test_foreign_group(self):
+        self.assertEqual(self.client.get(f'/groups/{self.foreign_group.pk}/events/').status_code, 404)
+
+    def test_no_groups(self):
+        self.assertContains(self.client.get('/current/'), 'EventSource')
+        GroupUser.objects.get(user=self.user).delete()
+        self.assertNotContains(self.client.get('/current/'), 'EventSource')
+        self.assertEqual(self.client.get('/events/').status_code, 204)
+
+
+class TodoEventsSignalsCase(TransactionTestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create_user(username='Vasek', password='1234')
+        self.group = Group.objects.create(name='TestGroup')
+        self.other_group = Group.objects.create(name='OtherGroup')
+
+    def published(self, since):
+        return [(event.group_id, event.event_type, json.loads(event.data)['title'])
+                for event in TodoEvent.objects.filter(pk__gt=since).order_by('pk')]
+
+    def test_todo_lifecycle(self):
+        since = events.broker.last_id
+        todo = Todo.objects.create(title='todo', user=self.user, group=self.group)
+        todo.description = 'edited'
+        todo.save()
+        todo.group = self.other_group
+        todo.save()
+        todo.completion_time = timezone.now()
+        todo.save()
+        todo.delete()
+        Todo.objects.create(title='own', user=self.user)
+        self.assertEqual(self.published(since), [
+            (self.group.pk, 'created', 'todo'),
+            (self.group.pk, 'edited', 'todo'),
+            (self.group.pk, 'deleted', 'todo'),
+            (self.other_group.pk, 'created', 'todo'),
+            (self.other_group.pk, 'completed', 'todo'),
+            (self.other_group.pk, 'deleted', 'todo'),
+        ])
+
+
+class SearchCase(TestCase):
+    def setUp(self) -> None:
+        self.client = Client()
+        self.user = User.objects.create_user(username='Vasek', password='1234')
+        self.other = User.objects.create_user(username='Test', password='1234')
+        self.client.force_login(self.user)
+        self.group = Group.objects.create(name='TestGroup')
+        GroupUser.objects.create(group=self.group, user=self.user, status='M')
+        self.invited_group = Group.objects.create(name='InvitedGroup')
+        GroupUser.objects.create(group=self.invited_group, user=self.user, status='I')
+
+    def titles(self, text, **kwargs):
+        return [todo.title for todo in search_todos(self.user, text, **kwargs)[0]]
+
+    def test_visibility(self):
+        Todo.objects.create(title='own milk', user=self.user)
+        Todo.objects.create(title='group milk', user=self.other, group=self.group)
+        Todo.objects.create(title='invited milk', user=self.other, group=self.invited_group)
+        Todo.objects.create(title='foreign milk', user=self.other)
+        self.assertEqual(sorted(self.titles('milk')), ['group milk', 'own milk'])
+
+    def test_ranking_and_prefix(self):
+        Todo.objects.create(title='call', description='buy bread for grandma', user=self.user)
+        Todo.objects.create(title='bread', description='buy bread', user=self.user)
+        self.assertEqual(self.titles('bread'), ['bread', 'call'])
+        self.assertEqual(self.titles('gran'), ['call'])
+        self.assertEqual(self.titles('bread" (('), ['bread', 'call'])
+        self.assertEqual(self.titles('!!!'), [])
+
+    def test_index_follows_writes(self):
+        todo = Todo.objects.create(title='old title', user=self.user)
+        todo.title = 'new title'
+        todo.save()
+        self.assertEqual(self.titles('old'), [])
+        self.assertEqual(self.titles('new'), ['new title'])
+        Todo.objects.filter(pk=todo.pk)._raw_delete('default')
+        self.assertEqual(self.titles('new'), [])
+
+    def test_archived_todos(self):
+        old = timezone.now() - timedelta(days=400)
+        Todo.objects.create(title='archived milk', user=self.user, completion_time=old)
+        Todo.objects.create(title='group archived milk', user=self.other, group=self.group, completion_time=old)
+        Todo.objects.create(title='foreign archived milk', user=self.other, completion_time=old)
+        Todo.objects.create(title='open milk', user=self.user)
+        call_command('archive_todos', stdout=StringIO())
+        self.assertEqual(Todo.objects.count(), 1)
+        self.assertEqual(sorted(self.titles('milk')), ['archived milk', 'group archived milk', 'open milk'])
+        response = self.client.get('/search/', {'q': 'archived'})
+        self.assertContains(response, 'archived milk')
+        todo = TodoArchive.objects.get(title='archived milk')
+        self.assertEqual(self.client.get(f'/todo/{todo.pk}/').status_code, 200)
+        TodoArchive.objects.filter(pk=todo.pk).delete()
+        self.assertEqual(sorted(self.titles('archived')), ['group archived milk'])
+
+    def test_index_is_repaired(self):
+        Todo.objects.create(title='kept todo', user=self.user)
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER todo_app_todo_fts_insert')
+        Todo.objects.create(title='lost todo', user=self.user)
+        ensure_search_index(connection)
+        self.assertEqual(self.titles('todo', page_size=5), ['kept todo', 'lost todo'])
+
+    def test_view_pages(self):
+        for i in range(25):
+            Todo.objects.create(title=f'paged {i}', user=self.user)
+        response = self.client.get('/search/', {'q': 'paged'})
+        self.assertEqual(len(response.context['todos']), 20)
+        self.assertTrue(response.context['has_next'])
+        response = self.client.get('/search/', {'q': 'paged', 'page': 2})
+        self.assertEqual(len(response.context['todos']), 5)
+        self.assertFalse(response.context['has_next'])
+
+
+class MetricsCase(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        registry.reset()
+        self.client = Client()
+        self.user = User.objects.create_user(username='Vasek', password='1234')
+        self.client.force_login(self.user)
+        Todo.objects.create(title='own todo', user=self.user)
+
+    def test_exposition(self):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get('/current/')
+        queries = len(context.captured_queries)
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('todo_requests_total{view="current_todos",status="200"} 1', body)
+        self.assertIn('todo_request_duration_seconds_count{view="current_todos"} 1', body)
+        self.assertIn(f'todo_request_queries_sum{{view="current_todos"}} {queries}', body)
+        self.assertIn('todo_template_render_seconds_bucket{view="current_todos",le="+Inf"} 1', body)
+        self.assertIn('todo_response_size_bytes_count{view="current_todos"} 1', body)
+
+    @override_settings(TODO_METRICS_ALLOWED_IPS=['10.0.0.1'])
+    def test_forbidden(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+    @override_settings(TODO_SLOW_REQUEST_THRESHOLD=0)
+    def test_slow_request_log(self):
+        with self.assertLogs('todo_app.slow_requests', 'WARNING') as logs:
+            self.client.get('/completed/')
+        self.assertIn('Slow request GET /completed/ (completed_todos)', logs.output[0])
+        self.assertIn('FROM "todo_app_todo"', logs.output[0])
+
+
+class SqlitePragmasCase(SimpleTestCase):
+    def setUp(self) -> None:
+        # A connection of its own, the pragmas must not leak into the connection of the other tests
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.connection = SqliteDatabaseWrapper(
+            {**connection.settings_dict, 'NAME': os.path.join(directory.name, 'pragmas.sqlite3')}, alias='pragmas')
+        self.addCleanup(self.connection.close)
+
+    def pragma(self, name):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied(self):
+        self.connection.ensure_connection()
+        with override_settings(TODO_SQLITE_PRAGMAS={'cache_size': -4321, 'temp_store': 'MEMORY'}):
+            apply_pragmas(None, self.connection)
+        self.assertEqual(self.pragma('cache_size'), -4321)
+        self.assertEqual(self.pragma('temp_store'), 2)
+
+    def test_default_profile_leaves_connection_alone(self):
+        cache_size = self.pragma('cache_size')
+        with override_settings(TODO_SQLITE_PRAGMAS={}):
+            apply_pragmas(None, self.connection)
+        self.assertEqual(self.pragma('cache_size'), cache_size)
+
+
+@skipUnless('replica' in settings.DATABASES, 'needs --settings=todolist.test_settings')
+@override_settings(TODO_REPLICA_DATABASE='replica')
+class ReplicaRouterCase(TestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self) -> None:
+        # The replica database of the tests is a separate file that is never written to, reads from
+        # it see none of the rows created here
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='Vasek', password='1234')
+        self.client.force_login(self.user)
+        self.todo = Todo.objects.create(title='primary todo', user=self.user)
+
+    def test_read_views_use_replica(self):
+        self.assertNotContains(self.client.get('/current/'), 'primary todo')
+        self.assertEqual(self.client.get('/groups/').status_code, 200)
+        self.assertNotIn(PIN_COOKIE, self.client.cookies)
+
+    def test_other_views_use_primary(self):
+        self.assertContains(self.client.get(f'/todo/{self.todo.pk}/edit/'), 'primary todo')
+
+    def test_writer_is_pinned_to_primary(self):
+        response = self.client.post('/create/', {'title': 'fresh todo', 'description': ''})
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 5)
+        response = self.client.get('/current/')
+        self.assertContains(response, 'fresh todo')
+        self.assertContains(response, 'primary todo')
+
+    def test_writes_go_to_primary(self):
+        replica_todo = Todo(pk=self.todo.pk + 1, title='replica copy', user_id=self.user.pk)
+        replica_todo._state.db = 'replica'
+        replica_todo.save()
+        self.assertTrue(Todo.objects.using('default').filter(title='replica copy').exists())
+        self.assertFalse(Todo.objects.using('replica').exists())
+
+
+@override_settings(TODO_PAGE_SIZE=3)
+class ArchiveCase(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='Vasek', password='1234')
+        self.client.force_login(self.user)
+        now = timezone.now()
+        self.old = []
+        for i in range(5):
+            todo = Todo.objects.create(title=f'old {i}', user=self.user)
+            Todo.objects.filter(pk=todo.pk).update(completion_time=now - timedelta(days=400, hours=i))
+            self.old.append(todo)
+        self.recent = Todo.objects.create(title='recent', user=self.user, completion_time=now)
+        self.open = Todo.objects.create(title='open', user=self.user)
+
+    def archive(self, **options):
+        call_command('archive_todos', days=365, stdout=StringIO(), **options)
+
+    def test_moves_old_completed_todos(self):
+        self.archive(batch_size=2)
+        self.assertEqual(set(TodoArchive.objects.values_list('pk', flat=True)), {todo.pk for todo in self.old})
+        self.assertEqual(set(Todo.objects.values_list('title', flat=True)), {'recent', 'open'})
+        archived = TodoArchive.objects.get(pk=self.old[0].pk)
+        self.assertEqual(archived.title, 'old 0')
+        self.assertEqual(archived.creation_time, self.old[0].creation_time)
+
+    def test_batches_read_from_index(self):
+        sql, params = archive_candidates(timezone.now(), self.open.pk).values('pk')[:500].query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(str(row) for row in cursor.fetchall())
+        self.assertIn('todo_completed_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_resumes_after_interruption(self):
+        self.archive(batch_size=2, max_batches=1)
+        self.assertEqual(TodoArchive.objects.count(), 2)
+        self.archive(batch_size=2)
+        self.assertEqual(TodoArchive.objects.count(), 5)
+
+    def test_completed_list_pages_into_archive(self):
+        self.client.get('/completed/')
+        self.archive(batch_size=2, max_batches=2)
+        titles = []
+        url = '/completed/'
+        while url:
+            response = self.client.get(url)
+            titles.extend(todo.title for todo in response.context['todos'])
+            url = f"/completed/?after={response.context['cursor']}" if response.context['cursor'] else None
+        self.assertEqual(titles, ['recent', 'old 0', 'old 1', 'old 2', 'old 3', 'old 4'])
+
+    def test_view_archived_todo(self):
+        self.archive()
+        response = self.client.get(f'/todo/{self.old[0].pk}/')
+        self.assertContains(response, 'old 0')
+        self.assertNotContains(response, 'Edit')
+        other = Client()
+        other.force_login(User.objects.create_user(username='Test', password='1234'))
+        self.assertEqual(other.get(f'/todo/{self.old[0].pk}/').status_code, 404)
+
+
+class CountersCase(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='Vasek', password='1234')
+        self.client.force_login(self.user)
+        self.group = Group.objects.create(name='TestGroup')
+        GroupUser.objects.create(group=self.group, user=self.user, status='C')
+        Todo.objects.create(title='existing', user=self.user, importance=True)
+        # Counters are created on first read
+        get_counts(user_id=self.user.pk)
+        get_counts(group_id=self.group.pk)
+
+    def assertCounts(self, user_counts, group_counts):
+        for (user_id, group_id), counts in (((self.user.pk, None), user_counts), ((None, self.group.pk), group_counts)):
+            stored = TodoCounter.objects.filter(user_id=user_id, group_id=group_id).values(*counts).get()
+            self.assertEqual(stored, counts)
+            self.assertEqual(count_todos(user_id, group_id), counts)
+
+    def test_model_changes_update_counters(self):
+        self.assertCounts({'open': 1, 'completed': 0, 'important': 1}, {'open': 0, 'completed': 0, 'important': 0})
+        todo = Todo.objects.create(title='moving', user=self.user, importance=True)
+        todo.group = self.group
+        todo.save()
+        self.assertCounts({'open': 1, 'completed': 0, 'important': 1}, {'open': 1, 'completed': 0, 'important': 1})
+        todo.completion_time = timezone.now()
+        todo.save()
+        self.assertCounts({'open': 1, 'completed': 0, 'important': 1}, {'open': 0, 'completed': 1, 'important': 0})
+        todo.delete()
+        self.assertCounts({'open': 1, 'completed': 0, 'important': 1}, {'open': 0, 'completed': 0, 'important': 0})
+
+    def test_bulk_api_updates_counters(self):
+        todos = [Todo.objects.create(title=f'todo {i}', user=self.user) for i in range(3)]
+        self.client.post('/api/todos/bulk/', json.dumps({
+            'create': [{'title': 'new', 'importance': True, 'group': self.group.pk}],
+            'complete': [todos[0].pk, todos[1].pk],
+            'delete': [todos[1].pk, todos[2].pk],
+        }), content_type='application/json')
+        self.assertCounts({'open': 1, 'completed': 1, 'important': 1}, {'open': 1, 'completed': 0, 'important': 1})
+
+    def test_pages_show_counters(self):
+        TodoCounter.objects.filter(user=self.user).update(open=42)
+        TodoCounter.objects.filter(group=self.group).update(completed=17)
+        cache.clear()
+        self.assertContains(self.client.get('/'), 'title="Open">42<')
+        self.assertContains(self.client.get(f'/groups/{self.group.pk}/'), 'completed: 17')
+
+    def test_reconcile_fixes_drift(self):
+        TodoCounter.objects.filter(user=self.user).update(open=5)
+        out = StringIO()
+        call_command('reconcile_counters', dry_run=True, stdout=out)
+        self.assertIn(f'user {self.user.pk}: open 5 -> 1', out.getvalue())
+        self.assertEqual(TodoCounter.objects.get(user=self.user).open, 5)
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(get_counts(user_id=self.user.pk)['open'], 1)
+
+    def test_backfill_migration(self):
+        other = User.objects.create_user(username='Test', password='1234')
+        Todo.objects.create(title='other', user=other, completion_time=timezone.now())
+        TodoArchive.objects.create(id=1000, title='archived', user=self.user, group=self.group,
+                                   creation_time=timezone.now(), completion_time=timezone.now(),
+                                   updated_at=timezone.now())
+        TodoCounter.objects.filter(user=self.user).update(open=5)
+        TodoCounter.objects.filter(group=self.group).delete()
+        migration = importlib.import_module('todo_app.migrations.0016_backfill_counters')
+        migration.backfill_counters(apps, None)
+        self.assertCounts({'open': 1, 'completed': 0, 'important': 1}, {'open': 0, 'completed': 1, 'important': 0})
+        self.assertEqual(TodoCounter.objects.filter(user=other).values('open', 'completed').get(),
+                         {'open': 0, 'completed': 1})
+
+
+class CountersCommitCase(TransactionTestCase):
+    def test_counts_evicted_after_commit(self):
+        user = User.objects.create_user(username='Vasek', password='1234')
+        get_counts(user_id=user.pk)
+        with transaction.atomic():
+            Todo.objects.create(title='new', user=user)
+            # Cached by a concurrent read of the counter before the commit
+            cache.set(counts_key(user.pk, None), {'open': 0, 'completed': 0, 'important': 0})
+        self.assertEqual(get_counts(user_id=user.pk)['open'], 1)
+
+
+@override_settings(TODO_SHARED_CACHE=True, SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+class AccessCase(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='Vasek', password='1234')
+        self.other = User.objects.create_user(username='Test', password='1234')
+        self.client.force_login(self.user)
+        self.group = Group.objects.create(name='TestGroup')
+        GroupUser.objects.create(group=self.group, user=self.user, status='M')
+        GroupUser.objects.create(group=self.group, user=self.other, status='C')
+        self.own = Todo.objects.create(title='own todo', user=self.user)
+        self.group_todo = Todo.objects.create(title='group todo', user=self.other, group=self.group)
+        self.foreign = Todo.objects.create(title='foreign todo', user=self.other)
+        # Caches the session user, the navbar counts and the state of the page validators
+        self.client.get('/current/')
+
+    def test_todo_checks_take_one_query(self):
+        for url in (f'/todo/{self.own.pk}/', f'/todo/{self.group_todo.pk}/'):
+            with self.subTest(url=url), self.assertNumQueries(1):
+                self.assertEqual(self.client.get(url).status_code, 200)
+        with self.assertNumQueries(2):
+            # todo, group choices of the form
+            response = self.client.get(f'/todo/{self.group_todo.pk}/edit/')
+        self.assertEqual(list(response.context['form'].fields['group'].queryset), [self.group])
+        self.assertContains(self.client.get(f'/todo/{self.group_todo.pk}/'), 'group todo')
+
+    def test_group_pages(self):
+        with self.assertNumQueries(1):
+            self.assertContains(self.client.get('/groups/'), 'TestGroup')
+        self.client.get(f'/groups/{self.group.pk}/')
+        with self.assertNumQueries(2):
+            # memberships, members
+            response = self.client.get(f'/groups/{self.group.pk}/')
+        self.assertEqual([member.username for member in response.context['members']], ['Vasek', 'Test'])
+
+    def test_refused(self):
+        self.assertEqual(self.client.get(f'/todo/{self.foreign.pk}/').status_code, 404)
+        self.assertEqual(self.client.get(f'/todo/{self.foreign.pk}/edit/').status_code, 404)
+        GroupUser.objects.filter(user=self.user).update(status='I')
+        self.assertEqual(self.client.get(f'/todo/{self.group_todo.pk}/').status_code, 404)
+        self.assertEqual(self.client.get(f'/groups/{self.group.pk}/').status_code, 404)
+
+    def test_only_creator_deletes_group(self):
+        self.assertEqual(self.client.post(f'/groups/{self.group.pk}/', {'delete': ''}).status_code, 404)
+        self.assertTrue(Group.objects.filter(pk=self.group.pk).exists())
+
+    def test_last_member_leaving_deletes_group(self):
+        self.client.post(f'/groups/{self.group.pk}/', {'leave': ''})
+        self.assertTrue(Group.objects.filter(pk=self.group.pk).exists())
+        self.client.force_login(self.other)
+        self.client.post(f'/groups/{self.group.pk}/', {'leave': ''})
+        self.assertIsNotNone(Group.objects.get(pk=self.group.pk).deleted_at)
+
+
+class BulkInviteCase(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='Vasek', password='1234')
+        self.client.force_login(self.user)
+        self.group = Group.objects.create(name='TestGroup')
+        GroupUser.objects.create(group=self.group, user=self.user, status='C')
+        User.objects.bulk_create([User(username=f'user{i}') for i in range(30)])
+        self.client.get(f'/groups/{self.group.pk}/')
+
+    def invite(self, usernames):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(f'/groups/{self.group.pk}/', {'usernames': usernames})
+        self.assertEqual(response.status_code, 200)
+        return response, len(context.captured_queries)
+
+    def test_report(self):
+        GroupUser.objects.create(group=self.group, user=User.objects.get(username='user1'), status='I')
+        response, _ = self.invite('user0, user1\nVasek nobody user0')
+        self.assertEqual(response.context['invite_results'], [
+            ('user0', 'Invitation has been sent'),
+            ('user1', 'Invite has already been sent'),
+            ('Vasek', 'Already a member'),
+            ('nobody', 'User does not exist'),
+        ])
+        self.assertEqual(GroupUser.objects.filter(group=self.group, status='I').count(), 2)
+
+    def test_constant_queries(self):
+        _, few = self.invite('user0 user1 user2')
+        _, many = self.invite(' '.join(f'user{i}' for i in range(3, 30)))
+        self.assertEqual(few, many)
+        self.assertEqual(GroupUser.objects.filter(group=self.group, status='I').count(), 30)
+
+    def test_invitee_sees_invite(self):
+        invitee = User.objects.get(username='user5')
+        other = Client()
+        other.force_login(invitee)
+        self.assertNotContains(other.get('/groups/'), 'TestGroup - ')
+        self.invite('user5')
+        self.assertContains(other.get('/groups/'), 'TestGroup - ')
+
+    @override_settings(TODO_MAX_INVITES=2)
+    def test_limit(self):
+        response, _ = self.invite('user0 user1 user2')
+        self.assertContains(response, 'Too many usernames')
+        self.assertFalse(GroupUser.objects.filter(status='I').exists())
+
+
+@override_settings(TODO_SHARED_CACHE=True, SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+class GroupDeleteCase(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='Vasek', password='1234')
+        self.member = User.objects.create_user(username='Test', password='1234')
+        self.invited = User.objects.create_user(username='Invited', password='1234')
+        self.client.force_login(self.user)
+        self.group = Group.objects.create(name='TestGroup')
+        GroupUser.objects.create(group=self.group, user=self.user, status='C')
+        GroupUser.objects.create(group=self.group, user=self.member, status='M')
+        GroupUser.objects.create(group=self.group, user=self.invited, status='I')
+        self.todos = Todo.objects.bulk_create([Todo(title=f'group todo {i}', user=self.member, group=self.group)
+                                               for i in range(25)])
+        self.done = Todo.objects.create(title='done group todo', user=self.member, group=self.group,
+                                        completion_time=timezone.now())
+        self.own = Todo.objects.create(title='own todo', user=self.member)
+        self.other_group = Group.objects.create(name='OtherGroup')
+        GroupUser.objects.create(group=self.other_group, user=self.member, status='C')
+        self.other_todo = Todo.objects.create(title='other todo', user=self.member, group=self.other_group)
+        # Caches the session user
+        self.client.get('/groups/')
+
+    def test_delete_hides_group(self):
+        member = Client()
+        member.force_login(self.member)
+        invited = Client()
+        invited.force_login(self.invited)
+        # Cache the lists and the invites
+        self.assertContains(member.get('/current/'), 'group todo 0')
+        self.assertContains(invited.get('/groups/'), 'TestGroup - ')
+
+        with self.assertNumQueries(5):
+            # memberships, group update, members of the lists to invalidate, invited users, purge job
+            response = self.client.post(f'/groups/{self.group.pk}/', {'delete': ''})
+        self.assertRedirects(response, '/groups/', fetch_redirect_response=False)
+        self.assertEqual(Todo.objects.filter(group=self.group).count(), 26)
+
+        self.assertNotContains(member.get('/current/'), 'group todo')
+        self.assertContains(member.get('/current/'), 'own todo')
+        self.assertNotContains(member.get('/completed/'), 'done group todo')
+        self.assertNotContains(member.get('/groups/'), 'TestGroup')
+        self.assertNotContains(invited.get('/groups/'), 'TestGroup - ')
+        self.assertEqual(member.get(f'/groups/{self.group.pk}/').status_code, 404)
+        self.assertEqual(member.get(f'/todo/{self.todos[0].pk}/').status_code, 404)
+        self.assertEqual(member.get('/search/', {'q': 'group todo'}).context['todos'], [])
+
+    def test_accept_invite(self):
+        invited = Client()
+        invited.force_login(self.invited)
+        # Same name as the invite's group
+        namesake = Group.objects.create(name='TestGroup')
+        GroupUser.objects.create(group=namesake, user=self.invited, status='I')
+        self.assertEqual(invited.post('/groups/accept/', {'group': 'TestGroup'}).status_code, 404)
+        self.assertEqual(invited.post('/groups/accept/', {'group': self.other_group.pk}).status_code, 404)
+
+        self.client.post(f'/groups/{self.group.pk}/', {'delete': ''})
+        self.assertEqual(invited.post('/groups/accept/', {'group': self.group.pk}).status_code, 404)
+        self.assertRedirects(invited.post('/groups/accept/', {'group': namesake.pk}), '/',
+                             fetch_redirect_response=False)
+        self.assertEqual(GroupUser.objects.get(group=namesake, user=self.invited).status, 'M')
+        self.assertEqual(GroupUser.objects.get(group=self.group, user=self.invited).status, 'I')
+
+    def test_purge(self):
+        self.client.post(f'/groups/{self.group.pk}/', {'delete': ''})
+        out = StringIO()
+        call_command('purge_groups', '--batch-size', '10', stdout=out)
+        self.assertIn('Purged 1 groups, 30 rows', out.getvalue())
+        self.assertFalse(Group.objects.filter(pk=self.group.pk).exists())
+        self.assertFalse(GroupUser.objects.filter(group=self.group.pk).exists())
+        self.assertEqual(list(Todo.objects.order_by('pk')), [self.own, self.other_todo])
+        self.assertEqual(search_todos(self.member, 'todo')[0], [self.own, self.other_todo])
+
+
+@override_settings(TODO_EXPORT_CHUNK_SIZE=2, TODO_IMPORT_BATCH_SIZE=2)
+class TransferCase(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='Vasek', password='1234')
+        self.other = User.objects.create_user(username='Test', password='1234')
+        self.client.force_login(self.user)
+        self.group = Group.objects.create(name='TestGroup')
+        GroupUser.objects.create(group=self.group, user=self.user, status='C')
+        self.open = Todo.objects.create(title='open, "quoted"', description='two\nlines', user=self.user,
+                                        importance=True)
+        self.done = Todo.objects.create(title='done', user=self.user, group=self.group,
+                                        completion_time=timezone.now())
+        TodoArchive.objects.create(id=1000, title='archived', user=self.user, creation_time=timezone.now(),
+                                   completion_time=timezone.now(), updated_at=timezone.now())
+        Todo.objects.create(title='foreign', user=self.other)
+
+    def export(self, file_format):
+        response = self.client.get('/export/', {'format': file_format})
+        self.assertTrue(response.streaming)
+        chunks = [chunk.decode() for chunk in response.streaming_content]
+        return chunks
+
+    def test_export_ndjson(self):
+        chunks = self.export('ndjson')
+        # Two rows per piece
+        self.assertEqual(len(chunks), 2)
+        rows = [json.loads(line) for line in ''.join(chunks).splitlines()]
+        self.assertEqual([(row['title'], row['group']) for row in rows],
+                         [('open, "quoted"', None), ('done', 'TestGroup'), ('archived', None)])
+        self.assertEqual(rows[1]['completion_time'], self.done.completion_time.isoformat())
+
+    def test_round_trip(self):
+        exports = {file_format: ''.join(self.export(file_format)) for file_format in ('csv', 'ndjson')}
+        for file_format, exported in exports.items():
+            with self.subTest(file_format=file_format):
+                upload = SimpleUploadedFile(f'todos.{file_format}', exported.encode())
+                response = self.client.post('/import/', {'file': upload})
+                self.assertEqual((response.context['created'], response.context['skipped']), (3, 0))
+        todos = Todo.objects.filter(user=self.user, group=None, title='open, "quoted"')
+        self.assertEqual(todos.count(), 3)
+        self.assertTrue(all(todo.description == 'two\nlines' and todo.importance for todo in todos))
+        self.assertEqual(Todo.objects.filter(user=self.user, title='archived', completion_time__isnull=False)
+                         .count(), 2)
+        self.assertEqual(get_counts(user_id=self.user.pk), count_todos(self.user.pk, None))
+
+    def test_import_errors(self):
+        upload = SimpleUploadedFile('todos.ndjson', b'{"title": "ok"}\nnot json\n[1]\n'
+                                                    b'{"title": ""}\n{"title": "late", "completion_time": "x"}\n')
+        response = self.client.post('/import/', {'file': upload})
+        self.assertEqual((response.context['created'], response.context['skipped']), (1, 4))
+        self.assertEqual([number for number, _ in response.context['errors']], [2, 3, 4, 5])
+        self.assertContains(self.client.get('/current/'), 'ok')
+
+    def test_command(self):
+        path = os.path.join(tempfile.mkdtemp(), 'todos.csv')
+        with open(path, 'w', newline='') as file:
+            file.write('title,description,importance\n')
+            for i in range(5):
+                file.write(f'imported {i},,False\n')
+        out = StringIO()
+        call_command('import_todos', 'Test', path, stdout=out)
+        self.assertIn('Imported 5 todos, skipped 0', out.getvalue())
+        self.assertEqual(Todo.objects.filter(user=self.other, title__startswith='imported').count(), 5)
+
+
+class StaticPipelineCase(TestCase):
+    def setUp(self) -> None:
+        self.source = tempfile.mkdtemp()
+        self.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.source, 'vendor'))
+        with open(os.path.join(self.source, 'vendor', 'bootstrap-4.5.0.min.css'), 'w') as file:
+            file.write('body { margin: 0 }\n' * 500)
+        for name in ('jquery-3.5.1.slim.min.js', 'popper-1.16.0.min.js', 'bootstrap-4.5.0.min.js'):
+            with open(os.path.join(self.source, 'vendor', name), 'w') as file:
+                file.write('void 0;\n')
+        with open(os.path.join(self.source, 'robots.txt'), 'w') as file:
+            file.write('User-agent: *\n')
+        self.static_settings = override_settings(STATICFILES_DIRS=[*settings.STATICFILES_DIRS, self.source],
+                                                 STATIC_ROOT=self.root)
+        self.static_settings.enable()
+        self.addCleanup(self.static_settings.disable)
+        self.addCleanup(is_vendored.cache_clear)
+        is_vendored.cache_clear()
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    def test_collect(self):
+        with open(os.path.join(self.root, 'staticfiles.json')) as file:
+            hashed = json.load(file)['paths']['vendor/bootstrap-4.5.0.min.css']
+        self.assertRegex(hashed, r'^vendor/bootstrap-4\.5\.0\.min\.[0-9a-f]{12}\.css$')
+        with gzip.open(os.path.join(self.root, hashed + '.gz')) as file:
+            self.assertEqual(file.read().decode(), 'body { margin: 0 }\n' * 500)
+        # Too small to be worth compressing
+        self.assertFalse(any(name.endswith('.gz') for name in os.listdir(self.root)))
+
+    def test_vendored_assets_are_served_hashed(self):
+        response = self.client.get('/login/')
+        stylesheet = re.search(r'<link rel="stylesheet" href="([^"]+)"', response.content.decode()).group(1)
+        self.assertRegex(stylesheet, r'^/static/vendor/bootstrap-4\.5\.0\.min\.[0-9a-f]{12}\.css$')
+        self.assertRegex(response.content.decode(), r'<script src="/static/vendor/jquery-3\.5\.1\.slim\.min\.'
+                                                     r'[0-9a-f]{12}\.js" integrity="sha384-')
+        self.assertNotContains(response, 'https://')
+
+        response = self.client.get(stylesheet, HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertTrue(response['Content-Type'].startswith('text/css'))
+        body = b''.join(response.streaming_content)
+        self.assertEqual(gzip.decompress(body).decode(), 'body { margin: 0 }\n' * 500)
+
+        response = self.client.get(stylesheet)
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(len(b''.join(response.streaming_content)), len('body { margin: 0 }\n' * 500))
+
+    def test_missing_vendor_asset_fails(self):
+        self.assertEqual(check_vendor_assets(None), [])
+        os.remove(os.path.join(self.source, 'vendor', 'jquery-3.5.1.slim.min.js'))
+        is_vendored.cache_clear()
+        self.assertEqual([warning.id for warning in check_vendor_assets(None)], ['todo_app.W001'])
+        with override_settings(STATIC_ROOT=tempfile.mkdtemp()):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            with self.assertRaisesMessage(ValueError, 'vendor/jquery-3.5.1.slim.min.js'):
+                self.client.get('/login/')
+
+    @override_settings(TODO_STATIC_MAX_AGE=30)
+    def test_unhashed_and_missing(self):
+        self.assertEqual(self.client.get('/static/robots.txt')['Cache-Control'], 'public, max-age=30')
+        self.assertEqual(self.client.get('/static/missing.css').status_code, 404)
+        self.assertEqual(self.client.get('/static/../manage.py').status_code, 404)
+
+
+@override_settings(TODO_SHARED_CACHE=True, SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+class ConditionalGetCase(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='Vasek', password='1234')
+        self.other = User.objects.create_user(username='Test', password='1234')
+        self.client.force_login(self.user)
+        self.group = Group.objects.create(name='TestGroup')
+        GroupUser.objects.create(group=self.group, user=self.user, status='C')
+        GroupUser.objects.create(group=self.group, user=self.other, status='M')
+        self.todo = Todo.objects.create(title='own todo', user=self.user)
+        self.group_todo = Todo.objects.create(title='group todo', user=self.other, group=self.group)
+        Todo.objects.create(title='done todo', user=self.user, completion_time=timezone.now())
+        self.urls = ['/current/', '/completed/', f'/todo/{self.group_todo.pk}/']
+
+    def test_not_modified(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response['ETag'].startswith('W/"'))
+                self.assertNotIn('Last-Modified', response)
+                self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+                cache.delete(list_key('validators', self.user.pk))
+                with self.assertNumQueries(1):
+                    # the validator state
+                    not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(not_modified.status_code, 304)
+                self.assertEqual(not_modified.templates, [])
+                self.assertEqual(not_modified['ETag'], response['ETag'])
+                # cached until the next write
+                with self.assertNumQueries(0):
+                    self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+                # Dates are not trusted
+                modified = self.client.get(url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+                self.assertEqual(modified.status_code, 200)
+
+    @override_settings(TODO_SHARED_CACHE=False)
+    def test_private_cache_reads_state(self):
+        etag = self.client.get('/current/')['ETag']
+        # Written by another worker, which can't invalidate this worker's cache
+        Todo.objects.filter(pk=self.todo.pk).update(title='renamed todo', updated_at=timezone.now())
+        self.assertEqual(self.client.get('/current/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_changes(self):
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+
+        def modified():
+            return [url for url in self.urls
+                    if self.client.get(url, HTTP_IF_NONE_MATCH=etags[url]).status_code == 200]
+
+        # Edited by another member
+        self.group_todo.description = 'changed'
+        self.group_todo.save()
+        self.assertEqual(modified(), self.urls)
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+
+        # Invited by another user
+        other_group = Group.objects.create(name='OtherGroup')
+        GroupUser.objects.create(group=other_group, user=self.other, status='C')
+        other = Client()
+        other.force_login(self.other)
+        other.post(f'/groups/{other_group.pk}/', {'usernames': 'Vasek'})
+        self.assertEqual(modified(), self.urls)
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        self.assertEqual(modified(), [])
+
+        self.client.post('/groups/accept/', {'group': other_group.pk})
+        self.assertEqual(modified(), self.urls)
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+
+        # Deleted, nothing is left with a newer timestamp
+        self.client.post(f'/todo/{self.todo.pk}/delete/')
+        self.assertFalse(Todo.objects.filter(pk=self.todo.pk).exists())
+        self.assertEqual(modified(), self.urls)
+
+
+class ReminderCase(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='Vasek', password='1234', email='vasek@example.com')
+        self.member = User.objects.create_user(username='Test', password='1234', email='test@example.com')
+        self.invited = User.objects.create_user(username='Invited', password='1234', email='invited@example.com')
+        self.client.force_login(self.user)
+        self.group = Group.objects.create(name='TestGroup')
+        GroupUser.objects.create(group=self.group, user=self.user, status='C')
+        GroupUser.objects.create(group=self.group, user=self.member, status='M')
+        GroupUser.objects.create(group=self.group, user=self.invited, status='I')
+        self.now = timezone.now()
+        self.soon = Todo.objects.create(title='soon', user=self.user, due_time=self.now + timedelta(minutes=5))
+        self.overdue = Todo.objects.create(title='overdue', user=self.user, group=self.group,
+                                           due_time=self.now - timedelta(days=1))
+        self.later = Todo.objects.create(title='later', user=self.user, due_time=self.now + timedelta(days=1))
+        Todo.objects.create(title='done', user=self.user, due_time=self.now, completion_time=self.now)
+        Todo.objects.create(title='no due time', user=self.user)
+
+    def send(self):
+        out = StringIO()
+        call_command('send_reminders', '--batch-size', '1', stdout=out)
+        return out.getvalue()
+
+    def test_sends_once(self):
+        self.assertIn('reminded of 2 todos', self.send())
+        self.assertEqual(sorted((message.subject, tuple(message.to)) for message in mail.outbox), [
+            ('Reminder: overdue', ('vasek@example.com', 'test@example.com')),
+            ('Reminder: soon', ('vasek@example.com',)),
+        ])
+        self.assertIn(f'http://localhost:8000/todo/{self.soon.pk}/', mail.outbox[1].body)
+        self.assertIn('reminded of 0 todos', self.send())
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_skips_users_without_email(self):
+        User.objects.filter(pk=self.user.pk).update(email='')
+        output = self.send()
+        self.assertIn('reminded of 1 todos, skipped 1 without an email address', output)
+        self.assertEqual([tuple(message.to) for message in mail.outbox], [('test@example.com',)])
+
+    def test_new_due_time_reminds_again(self):
+        self.send()
+        due_time = timezone.localtime(self.now).strftime('%Y-%m-%dT%H:%M')
+        self.client.post(f'/todo/{self.soon.pk}/edit/', {'title': 'soon', 'description': '', 'due_time': due_time})
+        self.soon.refresh_from_db()
+        self.assertIsNone(self.soon.reminder_sent_at)
+        self.send()
+        self.assertEqual([message.subject for message in mail.outbox[2:]], ['Reminder: soon'])
+
+    def test_failed_send_is_retried(self):
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError):
+            with self.assertRaises(OSError):
+                self.send()
+        self.assertFalse(Todo.objects.filter(reminder_sent_at__isnull=False).exists())
+        self.send()
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_scan_uses_index(self):
+        sql, params = pending_reminders(self.now, timedelta(minutes=15)).query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(str(row) for row in cursor.fetchall())
+        self.assertIn('todo_reminder_due_idx', plan)
+
+
+@override_settings(TODO_JOB_BACKOFF=10, TODO_JOB_MAX_ATTEMPTS=2, TODO_JOB_TIMEOUT=60)
+class JobQueueCase(TestCase):
+    def setUp(self) -> None:
+        self.calls = []
+        self.tasks = mock.patch.dict(jobs.TASKS, {'record': lambda **kwargs: self.calls.append(kwargs),
+                                                  'fail': mock.Mock(side_effect=ValueError('broken'))})
+        self.tasks.start()
+        self.addCleanup(self.tasks.stop)
+        self.now = timezone.now()
+
+    def run_claimed(self, now):
+        return [jobs.run_job(job.pk, job.claim) for job in jobs.claim(10, now)]
+
+    def test_enqueue_and_run(self):
+        job = jobs.enqueue('record', run_at=self.now - timedelta(seconds=5), todo_id=1)
+        jobs.enqueue('record', run_at=self.now + timedelta(minutes=1))
+        with self.assertRaises(ValueError):
+            jobs.enqueue('missing')
+
+        [(task_name, outcome, duration, wait)] = self.run_claimed(self.now)
+        self.assertEqual((task_name, outcome), ('record', 'done'))
+        self.assertAlmostEqual(wait, 5, places=3)
+        self.assertEqual(self.calls, [{'todo_id': 1}])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.claim), ('D', 1, ''))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_retry_with_backoff(self):
+        job = jobs.enqueue('fail', run_at=self.now)
+        self.assertEqual(self.run_claimed(self.now)[0][1], 'retry')
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'Q')
+        self.assertIn('ValueError: broken', job.last_error)
+        self.assertGreaterEqual(job.run_at, self.now + timedelta(seconds=10))
 
+        # Not due before the backoff has passed
+        self.assertEqual(self.run_claimed(self.now + timedelta(seconds=5)), [])
+        self.assertEqual(self.run_claimed(job.run_at)[0][1], 'failed')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('F', 2))
+        self.assertEqual(jobs.backoff(3), 40)
 
+    def test_claims_are_disjoint(self):
+        for _ in range(5):
+            jobs.enqueue('record', run_at=self.now)
+        first = jobs.claim(3, self.now)
+        second = jobs.claim(3, self.now)
+        self.assertEqual((len(first), len(second)), (3, 2))
+        self.assertFalse({job.pk for job in first} & {job.pk for job in second})
+        self.assertEqual(jobs.claim(3, self.now), [])
+        # A lost claim is not run
+        Job.objects.filter(pk=first[0].pk).update(claim='other')
+        self.assertIsNone(jobs.run_job(first[0].pk, first[0].claim))
 
+    def test_stale_jobs_requeued(self):
+        job = jobs.enqueue('record', run_at=self.now)
+        [claimed] = jobs.claim(1, self.now)
+        # Running longer than the timeout, but alive
+        self.assertEqual(jobs.heartbeat([claimed.claim], self.now + timedelta(seconds=50)), 1)
+        self.assertEqual(jobs.requeue_stale(self.now + timedelta(seconds=100)), 0)
+        self.assertEqual(jobs.requeue_stale(self.now + timedelta(seconds=111)), 1)
+        # The first worker finishing late does not touch the job anymore
+        self.assertIsNone(jobs.run_job(claimed.pk, claimed.claim))
+        [again] = jobs.claim(1, self.now + timedelta(seconds=111))
+        self.assertEqual(again.attempts, 2)
+        jobs.requeue_stale(self.now + timedelta(seconds=200))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.last_error), ('F', 'Timed out'))
 
+    def test_group_delete_purges_in_background(self):
+        user = User.objects.create_user(username='Vasek', password='1234')
+        group = Group.objects.create(name='TestGroup')
+        GroupUser.objects.create(group=group, user=user, status='C')
+        Todo.objects.create(title='group todo', user=user, group=group)
+        client = Client()
+        client.force_login(user)
+        client.post(f'/groups/{group.pk}/', {'delete': ''})
+        job = Job.objects.get()
+        self.assertEqual((job.task, json.loads(job.arguments)), ('purge_group', {'group_id': group.pk}))
 
+        self.assertEqual(self.run_claimed(timezone.now())[0][1], 'done')
+        self.assertFalse(Group.objects.filter(pk=group.pk).exists())
+        self.assertFalse(Todo.objects.exists())
 
 
+class JobWorkerCase(TransactionTestCase):
+    def test_thread_pool(self):
+        job_registry.reset()
+        jobs.enqueue('archive_todos', days=30)
+        jobs.enqueue('send_reminders')
+        jobs.enqueue('purge_group', group_id=1, unknown=True, max_attempts=1)
+        self.assertNotIn('command', jobs.TASKS)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'jobs.prom')
+            out = StringIO()
+            with mock.patch('sys.stdout', StringIO()):
+                call_command('run_jobs', '--once', '--workers', '2', '--metrics-file', path, stdout=out)
+            with open(path) as file:
+                metrics = file.read()
+        self.assertIn('Ran 3 jobs', out.getvalue())
+        self.assertEqual(sorted(Job.objects.values_list('status', flat=True)), ['D', 'D', 'F'])
+        self.assertIn('todo_jobs_total{task="archive_todos",status="done"} 1', metrics)
+        self.assertIn('todo_jobs_total{task="send_reminders",status="done"} 1', metrics)
+        self.assertIn('todo_jobs_total{task="purge_group",status="failed"} 1', metrics)
+        self.assertIn('todo_job_duration_seconds_count{task="purge_group"} 1', metrics)
 
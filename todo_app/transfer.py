@@ -0,0 +1,137 @@
+"""
+Export of a user's todos as CSV or NDJSON and import of such files, both in constant memory.
+"""
+import csv
+import io
+import json
+import time
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from .caching import invalidate_lists
+from .counters import apply_changes
+from .forms import BulkTodoForm
+from .models import Todo, TodoArchive
+
+
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+EXPORT_FIELDS = ('id', 'title', 'description', 'importance', 'creation_time', 'completion_time', 'due_time',
+                 'group')
+
+
+def _chunk_size():
+    return getattr(settings, 'TODO_EXPORT_CHUNK_SIZE', 2000)
+
+
+def export_rows(user):
+    """
+    Yields the user's todos, archived ones included, as dicts of EXPORT_FIELDS with the group name.
+    Rows are fetched chunk by chunk from a cursor, never all at once.
+    """
+    for model in (Todo, TodoArchive):
+        rows = model.objects.filter(user=user, group__deleted_at__isnull=True).order_by('pk') \
+            .values_list('pk', 'title', 'description', 'importance', 'creation_time', 'completion_time', 'due_time',
+                         'group__name')
+        for row in rows.iterator(chunk_size=_chunk_size()):
+            yield dict(zip(EXPORT_FIELDS, row))
+
+
+def _value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def export_stream(user, file_format):
+    """
+    Yields the export file in pieces of TODO_EXPORT_CHUNK_SIZE rows.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, EXPORT_FIELDS) if file_format == 'csv' else None
+    if writer is not None:
+        writer.writeheader()
+    for position, row in enumerate(export_rows(user), 1):
+        row = {field: _value(value) for field, value in row.items()}
+        if writer is not None:
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps(row) + '\n')
+        if position % _chunk_size() == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def parse_rows(lines, file_format):
+    """
+    Yields a dict per record of an iterable of text lines, or a ValueError for a broken NDJSON line.
+    """
+    if file_format == 'csv':
+        yield from csv.DictReader(lines)
+        return
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield ValueError('Invalid JSON')
+            continue
+        yield row if isinstance(row, dict) else ValueError('Record must be an object')
+
+
+def _build_todo(user, fields, row):
+    if isinstance(row, ValueError):
+        raise ValidationError(str(row))
+    times = {}
+    for name in ('completion_time', 'due_time'):
+        value = row.get(name) or None
+        if value is not None:
+            value = parse_datetime(str(value))
+            if value is None:
+                raise ValidationError(f'Invalid {name}')
+        times[name] = value
+    return Todo(user=user, **times, **{name: field.clean(row.get(name)) for name, field in fields.items()})
+
+
+def import_todos(user, rows, batch_size=None, max_errors=20):
+    """
+    Creates todos of the user from parsed rows with one bulk_create per batch, skipping invalid rows.
+
+    Imported todos go to the user's own list and get new ids and creation times, the group and
+    id columns of an export are ignored. Returns (created, skipped, the first max_errors errors as
+    (record number, message), rows per second).
+    """
+    batch_size = batch_size or getattr(settings, 'TODO_IMPORT_BATCH_SIZE', 1000)
+    # Same rules as the API, the form fields are reused for every row
+    fields = BulkTodoForm().fields
+    created = skipped = 0
+    errors = []
+    batch = []
+    start = time.perf_counter()
+
+    def flush():
+        with transaction.atomic():
+            Todo.objects.bulk_create(batch)
+            # bulk_create sends no signals
+            apply_changes([(user.pk, None, (None, todo.completion_time, todo.importance)) for todo in batch])
+        batch.clear()
+
+    for number, row in enumerate(rows, 1):
+        try:
+            batch.append(_build_todo(user, fields, row))
+        except ValidationError as error:
+            skipped += 1
+            if len(errors) < max_errors:
+                errors.append((number, '; '.join(error.messages)))
+            continue
+        created += 1
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    if created:
+        invalidate_lists([user.pk])
+    return created, skipped, errors, (created + skipped) / max(time.perf_counter() - start, 1e-9)
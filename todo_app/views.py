@@ -1,10 +1,31 @@
+import codecs
+import re
+
 from django.shortcuts import render, redirect, get_object_or_404, HttpResponse, HttpResponseRedirect
-from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
+from django.http import Http404, HttpResponseBadRequest, HttpResponseForbidden, StreamingHttpResponse
+from django.conf import settings
+from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
 from django.db import IntegrityError
+from django.db.models import Q, F, Window
+from django.db.models.functions import RowNumber
 from django.contrib.auth import login, logout, authenticate
-from .forms import TodoForm, GroupForm
-from .models import Todo, Group, GroupUser
+from .forms import SignupForm, TodoForm, GroupForm
+from .models import Todo, TodoArchive, Group, GroupUser
+from .access import ACTIVE_STATUSES, access_for
+from .caching import cached_lists, invalidate_invites
+from .counters import get_counts
+from .fragments import render_rows
+from .events import event_stream
+from .search import search_todos
+from . import jobs
+from .transfer import FORMATS, export_stream, import_todos, parse_rows
+from .metrics import registry
+from .routers import replica_reads
+from .conditional import conditional_page
+from .pagination import InvalidCursor, decode_cursor, keyset_page, merged_keyset_page, page_size, split_page
 from django.utils import timezone
 from django.contrib.auth.decorators import login_required
 
@@ -14,64 +35,219 @@ FORBIDDEN_GROUP_NAMES = ['self', 'items', ]
 
 def signup_user(request):
     if request.method == 'GET':
-        return render(request, '../templates/todo_app/signup_user.html', {'form': UserCreationForm()})
+        return render(request, '../templates/todo_app/signup_user.html', {'form': SignupForm()})
     else:
+        # Optional, reminders of due todos go there
+        email = request.POST.get('email', '').strip()
+        if email:
+            try:
+                validate_email(email)
+            except ValidationError:
+                return render(request, '../templates/todo_app/signup_user.html',
+                              {'form': SignupForm(), 'error': "Please, enter a valid email address"})
         if request.POST['password1'] == request.POST['password2']:
             try:
-                user = User.objects.create_user(request.POST['username'], password=request.POST['password1'])
+                user = User.objects.create_user(request.POST['username'], email=email,
+                                                password=request.POST['password1'])
                 user.save()
-                login(request, user)
+                login(request, user, backend=settings.AUTHENTICATION_BACKENDS[0])
                 return redirect('current_todos')
             except IntegrityError:
                 return render(request,
                               '../templates/todo_app/signup_user.html',
-                              {'form': UserCreationForm(),
+                              {'form': SignupForm(),
                                'error': "This username is already taken. Please, choose another one."}
                               )
         else:
             return render(request, '../templates/todo_app/signup_user.html',
-                          {'form': UserCreationForm(), 'error': "Passwords didn't match"})
+                          {'form': SignupForm(), 'error': "Passwords didn't match"})
+
+
+def _build_current_lists(user):
+    memberships = GroupUser.objects.filter(user=user, status__in=['C', 'M'], group__deleted_at__isnull=True) \
+        .select_related('group').order_by('group__name', 'group__pk')
+    user_groups = [membership.group for membership in memberships]
+
+    # First page of every list in one query: rank todos inside their list and keep page_size() + 1 of each
+    ranked = Todo.objects.filter(Q(user=user, group=None) | Q(group__in=[_group.pk for _group in user_groups]),
+                                 completion_time__isnull=True) \
+        .annotate(list_position=Window(RowNumber(), partition_by=[F('group')],
+                                       order_by=[F('creation_time').desc(), F('pk').desc()]))
+    sql, params = ranked.query.sql_with_params()
+    todos = Todo.objects.raw(f'SELECT * FROM ({sql}) ranked WHERE list_position <= %s '
+                             f'ORDER BY creation_time DESC, id DESC', (*params, page_size() + 1))
+
+    grouped = {_group.pk: [] for _group in user_groups}
+    user_todos = []
+    for todo in todos:
+        if todo.group_id is None:
+            user_todos.append(todo)
+        else:
+            grouped[todo.group_id].append(todo)
+
+    return split_page(user_todos, 'creation_time', 'self'), \
+        [(_group, *split_page(grouped[_group.pk], 'creation_time', _group.pk)) for _group in user_groups]
+
+
+def _completed_page(user, cursor=None):
+    # Old completed todos are moved to the archive by the archive_todos command
+    # Todos of deleted groups wait for purge_groups, the isnull lookup keeps todos without a group
+    return merged_keyset_page([Todo.objects.filter(user=user, completion_time__isnull=False,
+                                                   group__deleted_at__isnull=True),
+                               TodoArchive.objects.filter(user=user, group__deleted_at__isnull=True)],
+                              'completion_time', 'completed', cursor)
+
+
+def _build_completed_list(user):
+    return _completed_page(user)
+
+
+def _current_todos_context(request):
+    """
+    Raises InvalidCursor for a bad ?after= token.
+    """
+    if 'after' not in request.GET:
+        (user_todos, user_cursor), group_todos = cached_lists('current', request.user, _build_current_lists)
+    else:
+        cursor = decode_cursor(request.GET['after'])
+        list_id = cursor[0]
+        open_todos = Todo.objects.filter(completion_time__isnull=True)
+        if list_id == 'self':
+            user_todos, user_cursor = keyset_page(open_todos.filter(user=request.user, group=None),
+                                                  'creation_time', list_id, cursor)
+            group_todos = []
+        elif isinstance(list_id, int):
+            membership = access_for(request).group(list_id)
+            user_todos, user_cursor = [], None
+            group_todos = [(membership.group, *keyset_page(open_todos.filter(group=list_id),
+                                                           'creation_time', list_id, cursor))]
+        else:
+            raise InvalidCursor(request.GET['after'])
+
+    render_rows([*user_todos, *(todo for _, gr_todos, _ in group_todos for todo in gr_todos)],
+                'todo_app/rows/current_todo.html')
+    return {'user_todos': user_todos, 'user_cursor': user_cursor, 'group_todos': group_todos}
+
+
+def _completed_todos_context(request):
+    """
+    Raises InvalidCursor for a bad ?after= token.
+    """
+    if 'after' not in request.GET:
+        todos, next_cursor = cached_lists('completed', request.user, _build_completed_list)
+    else:
+        cursor = decode_cursor(request.GET['after'])
+        if cursor[0] != 'completed':
+            raise InvalidCursor(request.GET['after'])
+        todos, next_cursor = _completed_page(request.user, cursor)
+    render_rows(todos, 'todo_app/rows/completed_todo.html')
+    return {'todos': todos, 'cursor': next_cursor}
 
 
 @login_required
+@replica_reads
+@conditional_page
 def current_todos(request):
-    user_todos = Todo.objects.filter(user=request.user, completion_time__isnull=True, group=None).order_by('-creation_time')
-    groups = map(
-        lambda x: x.group,
-        filter(
-            lambda gu: gu.status == 'C' or gu.status == 'M',
-            GroupUser.objects.filter(user=request.user)
-        )
-    )
-    todos = {'self': user_todos}
-    for group in groups:
-        group = Group.objects.get(name=group)
-        todos[group.name] = Todo.objects.filter(group=group.pk, completion_time__isnull=True).order_by('-creation_time')
-
-    return render(request, '../templates/todo_app/current_todos.html', {'todos': todos})
+    try:
+        context = _current_todos_context(request)
+    except InvalidCursor:
+        return HttpResponseBadRequest('Bad cursor')
+    return render(request, '../templates/todo_app/current_todos.html', context)
 
 
 @login_required
+@replica_reads
+@conditional_page
 def completed_todos(request):
-    todos = Todo.objects.filter(user=request.user, completion_time__isnull=False).order_by('-completion_time')
-    return render(request, '../templates/todo_app/completed_todos.html', {'todos': todos})
+    try:
+        context = _completed_todos_context(request)
+    except InvalidCursor:
+        return HttpResponseBadRequest('Bad cursor')
+    return render(request, '../templates/todo_app/completed_todos.html', context)
+
+
+def _event_stream_response(request, group_ids):
+    try:
+        last_id = int(request.META['HTTP_LAST_EVENT_ID'])
+    except (KeyError, ValueError):
+        last_id = None
+    response = StreamingHttpResponse(event_stream(group_ids, last_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @login_required
-def edit_todo(request, todo_pk):
-    todo_obj = Todo.objects.get(pk=todo_pk)
+def todo_events(request):
+    group_ids = [membership.group_id for membership in access_for(request).active_memberships()]
+    if not group_ids:
+        # No stream holding a thread for nothing, browsers don't reconnect after a 204
+        return HttpResponse(status=204)
+    return _event_stream_response(request, group_ids)
+
+
+@login_required
+def group_events(request, group_id):
+    access_for(request).group(group_id)
+    return _event_stream_response(request, [group_id])
+
+
+@login_required
+def search(request):
+    query = request.GET.get('q', '').strip()
     try:
-        group_user = GroupUser.objects.get(user=request.user, group=todo_obj.group)
-        group = Group.objects.get(pk=group_user.group.pk)
-    except GroupUser.DoesNotExist:
-        get_object_or_404(Todo, user=request.user, pk=todo_pk)
+        page = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        page = 1
+    todos, has_next = search_todos(request.user, query, page) if query else ([], False)
+    return render(request, '../templates/todo_app/search.html',
+                  {'query': query, 'todos': todos, 'page': page, 'has_next': has_next})
+
+
+@login_required
+def export_todos(request):
+    file_format = request.GET.get('format', 'csv')
+    if file_format not in FORMATS:
+        return HttpResponseBadRequest('Unknown format')
+    # Rows are streamed from a database cursor as the client reads them
+    response = StreamingHttpResponse(export_stream(request.user, file_format), content_type=FORMATS[file_format])
+    response['Content-Disposition'] = f'attachment; filename="todos.{file_format}"'
+    return response
 
+
+@login_required
+def import_todos_view(request):
     if request.method == 'GET':
-        form = TodoForm(instance=todo_obj)
+        return render(request, '../templates/todo_app/import_todos.html', {'formats': FORMATS})
+    upload = request.FILES.get('file')
+    if upload is None:
+        return render(request, '../templates/todo_app/import_todos.html',
+                      {'formats': FORMATS, 'error': 'Choose a file'})
+    file_format = request.POST.get('format') or upload.name.rpartition('.')[2].lower()
+    if file_format not in FORMATS:
+        return render(request, '../templates/todo_app/import_todos.html',
+                      {'formats': FORMATS, 'error': 'Unknown format'})
+    try:
+        # The upload is read line by line, large files are spooled to disk by Django
+        created, skipped, errors, rate = import_todos(request.user,
+                                                      parse_rows(codecs.iterdecode(upload, 'utf-8'), file_format))
+    except UnicodeDecodeError:
+        return render(request, '../templates/todo_app/import_todos.html',
+                      {'formats': FORMATS, 'error': 'The file must be UTF-8'})
+    return render(request, '../templates/todo_app/import_todos.html',
+                  {'formats': FORMATS, 'created': created, 'skipped': skipped, 'errors': errors, 'rate': rate})
+
+
+@login_required
+def edit_todo(request, todo_pk):
+    todo_obj = access_for(request).todo(todo_pk)
+
+    if request.method == 'GET':
+        form = TodoForm(instance=todo_obj, user=request.user)
         return render(request, '../templates/todo_app/edit_todo.html', {'todo': todo_obj, 'form': form})
     else:
         try:
-            form = TodoForm(request.POST, instance=todo_obj)
+            form = TodoForm(request.POST, instance=todo_obj, user=request.user)
             form.save()
             return redirect('current_todos')
         except ValueError:
@@ -79,19 +255,22 @@ def edit_todo(request, todo_pk):
                           {'todo': todo_obj, 'form': form, 'error': 'Bad data. Fuck you!'})
 
 
+def _view_todo_context(request, todo_pk):
+    access = access_for(request)
+    try:
+        todo_obj = access.todo(todo_pk)
+    except Http404:
+        todo_obj = access.todo(todo_pk, TodoArchive)
+    name = todo_obj.group.name if todo_obj.membership_status in ACTIVE_STATUSES else None
+    return {'todo': todo_obj, 'group_name': name, 'archived': isinstance(todo_obj, TodoArchive)}
+
+
 @login_required
+@replica_reads
+@conditional_page
 def view_todo(request, todo_pk):
     if request.method == 'GET':
-        todo_obj = Todo.objects.get(pk=todo_pk)
-        try:
-            group_user = GroupUser.objects.get(user=request.user, group=todo_obj.group)
-            group = Group.objects.get(pk=group_user.group.pk)
-            name = group.name
-        except GroupUser.DoesNotExist:
-            get_object_or_404(Todo, user=request.user, pk=todo_pk)
-            name = None
-
-        return render(request, '../templates/todo_app/view_todo.html', {'todo': todo_obj, 'group_name': name})
+        return render(request, '../templates/todo_app/view_todo.html', _view_todo_context(request, todo_pk))
 
 
 @login_required
@@ -121,17 +300,17 @@ def login_user(request):
 @login_required
 def create_todo(request):
     if request.method == 'GET':
-        return render(request, '../templates/todo_app/create_todo.html', {'form': TodoForm()})
+        return render(request, '../templates/todo_app/create_todo.html', {'form': TodoForm(user=request.user)})
     else:
         try:
-            form = TodoForm(request.POST)
+            form = TodoForm(request.POST, user=request.user)
             new_todo = form.save(commit=False)
             new_todo.user = request.user
             new_todo.save()
             return redirect('current_todos')
         except ValueError:
             return render(request, '../templates/todo_app/create_todo.html',
-                          {'form': TodoForm(), 'error': 'Bad data. Fuck you.'})
+                          {'form': TodoForm(user=request.user), 'error': 'Bad data. Fuck you.'})
 
 
 @login_required
@@ -152,9 +331,9 @@ def delete_todo(request, todo_pk):
 
 
 @login_required
+@replica_reads
 def groups(request):
-    _groups = [membership.group for membership in GroupUser.objects.filter(user=request.user)
-               if membership.status != 'I']
+    _groups = [membership.group for membership in access_for(request).active_memberships()]
     return render(request, '../templates/todo_app/groups.html', {'groups': _groups})
 
 
@@ -172,58 +351,106 @@ def create_group(request):
         return redirect('groups')
 
 
+INVITE_RESULTS = {
+    'invited': 'Invitation has been sent',
+    'unknown': 'User does not exist',
+    'invited_before': 'Invite has already been sent',
+    'member': 'Already a member',
+}
+
+
+def _invite(group, usernames):
+    """
+    Invites the users with a constant number of queries. Returns [(username, INVITE_RESULTS key)].
+    """
+    users = dict(User.objects.filter(username__in=usernames).values_list('username', 'pk'))
+    statuses = dict(GroupUser.objects.filter(group=group, user__in=users.values()).values_list('user', 'status'))
+
+    results, invited = [], []
+    for username in usernames:
+        user_id = users.get(username)
+        if user_id is None:
+            results.append((username, 'unknown'))
+        elif user_id in statuses:
+            results.append((username, 'invited_before' if statuses[user_id] == 'I' else 'member'))
+        else:
+            results.append((username, 'invited'))
+            invited.append(GroupUser(group=group, user_id=user_id, status='I'))
+    # A concurrent invite of the same user is skipped by the unique constraint
+    GroupUser.objects.bulk_create(invited, ignore_conflicts=True)
+    # bulk_create sends no signals
+    invalidate_invites(*(invite.user_id for invite in invited))
+    return results
+
+
+def _delete_group(group):
+    """
+    Marks the group deleted, which hides it everywhere. Cascading through its todos here would load
+    them all into memory, a background job removes the rows later.
+    """
+    group.deleted_at = timezone.now()
+    # The post_save signal invalidates the lists of the members
+    group.save(update_fields=['deleted_at'])
+    invalidate_invites(*GroupUser.objects.filter(group=group, status='I').values_list('user', flat=True))
+    jobs.enqueue('purge_group', group_id=group.pk)
+
+
+def _group_context(request, group_id, membership, **extra):
+    members = User.objects.filter(groupuser__group=group_id, groupuser__status__in=ACTIVE_STATUSES) \
+        .order_by('groupuser')
+    return {'group': membership.group, 'status': membership.status, 'members': list(members),
+            'counts': get_counts(group_id=group_id), **extra}
+
+
 @login_required
 def group(request, group_id):
-    membership = get_object_or_404(GroupUser, group=group_id, user=request.user)
-    members = [member.user for member in GroupUser.objects.filter(group=group_id) if member.status != 'I']
-    if membership.status == 'I':
-        return HttpResponse(404)
+    access = access_for(request)
+    membership = access.group(group_id)
     if request.method == 'GET':
-        _group = Group.objects.get(pk=group_id)
-        return render(request, '../templates/todo_app/group.html',
-                      {'group': _group, 'status': membership.status, 'members': members})
+        return render(request, '../templates/todo_app/group.html', _group_context(request, group_id, membership))
     else:
-        if 'username' in request.POST:
-            if User.objects.filter(username=request.POST['username']).exists() \
-                    and not GroupUser.objects.filter(user=User.objects.get(username=request.POST['username']), group=group_id).exists():
-                try:
-                    GroupUser.objects.create(group=get_object_or_404(Group, pk=group_id),
-                                             user=User.objects.get(username=request.POST['username']),
-                                             status='I').save()
-                    _group = Group.objects.get(pk=group_id)
-                    return render(request, '../templates/todo_app/group.html',
-                                  {'group': _group, 'error': 'Invitation has been sent',
-                                   'status': membership.status, 'members': members})
-                except User.DoesNotExist:
-                    _group = Group.objects.get(pk=group_id)
-                    return render(request, '../templates/todo_app/group.html',
-                                  {'group': _group, 'error': 'User does not exist',
-                                   'status': membership.status, 'members': members})
-            else:
-                _group = Group.objects.get(pk=group_id)
+        if 'usernames' in request.POST or 'username' in request.POST:
+            access.group(group_id, statuses=['C'])
+            # Separated by spaces, commas or new lines, duplicates dropped
+            text = request.POST.get('usernames', request.POST.get('username', ''))
+            usernames = list(dict.fromkeys(name for name in re.split(r'[\s,;]+', text) if name))
+            if len(usernames) > getattr(settings, 'TODO_MAX_INVITES', 500):
                 return render(request, '../templates/todo_app/group.html',
-                              {'group': _group, 'error': 'Invite has already been sent',
-                               'status': membership.status, 'members': members})
+                              _group_context(request, group_id, membership, error='Too many usernames'))
+            results = [(username, INVITE_RESULTS[result])
+                       for username, result in _invite(membership.group, usernames)]
+            error = results[0][1] if len(results) == 1 else None
+            return render(request, '../templates/todo_app/group.html',
+                          _group_context(request, group_id, membership, error=error,
+                                         invite_results=results if len(results) > 1 else None))
         elif 'delete' in request.POST:
-            get_object_or_404(Group, pk=group_id).delete()
+            access.group(group_id, statuses=['C'])
+            _delete_group(membership.group)
             return redirect('groups')
         elif 'leave' in request.POST:
-            get_object_or_404(GroupUser, group=group_id, user=request.user).delete()
-            for obj in GroupUser.objects.filter(pk=group_id):
-                if obj.status != 'I':
-                    break
-            else:
-                Group.objects.get(pk=group_id).delete()
+            membership.delete()
+            if not GroupUser.objects.filter(group=group_id, status__in=ACTIVE_STATUSES).exists():
+                _delete_group(membership.group)
             return redirect('groups')
 
 
 @login_required
 def group_accept(request):
     if request.method == 'POST':
-        obj = GroupUser.objects.get(user=request.user, group=Group.objects.get(name=request.POST['group']))
-        obj.status = 'M'
-        obj.save()
+        # By id, group names are not unique. Invites of deleted groups are gone.
+        group_id = request.POST.get('group', '')
+        if not group_id.isdigit():
+            raise Http404('No such group')
+        membership = access_for(request).group(int(group_id), statuses=['I'])
+        membership.status = 'M'
+        membership.save()
 
         next = request.POST.get('next', '/')
         return HttpResponseRedirect(next)
 
+
+def metrics(request):
+    allowed_ips = getattr(settings, 'TODO_METRICS_ALLOWED_IPS', None)
+    if allowed_ips is not None and request.META.get('REMOTE_ADDR') not in allowed_ips:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/3.0/ref/settings/
 
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -26,6 +28,9 @@ DEBUG = True
 
 ALLOWED_HOSTS = ['*']
 
+# Serve the read-heavy views as async views (set by asgi.py, needs Django 3.1+)
+TODO_ASYNC_VIEWS = os.environ.get('TODO_ASYNC_VIEWS') == '1'
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -40,6 +45,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'todo_app.static.StaticFilesMiddleware',
+    'todo_app.middleware.PerformanceMiddleware',
+    'todo_app.routers.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -63,6 +71,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'todo_app.context_processor.invites_processor',
+                'todo_app.context_processor.counts_processor',
             ],
         },
     },
@@ -76,10 +85,127 @@ WSGI_APPLICATION = 'todolist.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'NAME': os.environ.get('TODO_SQLITE_PATH', os.path.join(BASE_DIR, 'db.sqlite3')),
     }
 }
 
+# Read replica of the default database, e.g. a copy of db.sqlite3 kept up to date by Litestream.
+# current_todos, completed_todos, view_todo and groups read from it when TODO_REPLICA_PATH is set.
+# todolist.test_settings always adds the alias for the tests.
+TODO_REPLICA_DATABASE = 'replica' if os.environ.get('TODO_REPLICA_PATH') else None
+if TODO_REPLICA_DATABASE:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['TODO_REPLICA_PATH'],
+    }
+
+DATABASE_ROUTERS = ['todo_app.routers.ReplicaRouter']
+
+# Seconds a client reads from the default database after writing, covers the replication lag
+TODO_REPLICA_PIN_SECONDS = 5
+
+# TODO_SQLITE_PROFILE=production tunes SQLite for concurrent workers: WAL lets readers run next to
+# the writer, synchronous=NORMAL fsyncs on checkpoints only, busy_timeout makes writers wait for
+# the lock instead of failing with "database is locked", connections are kept between requests.
+# The pragmas run on every new connection, journal_mode=WAL also sticks to the database file
+TODO_SQLITE_PROFILE = os.environ.get('TODO_SQLITE_PROFILE', 'default')
+
+if TODO_SQLITE_PROFILE == 'production':
+    DATABASES['default']['CONN_MAX_AGE'] = 600
+    TODO_SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 10000,
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,
+        'temp_store': 'MEMORY',
+    }
+else:
+    TODO_SQLITE_PRAGMAS = {}
+
+# Cache
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+
+# TODO_CACHE_BACKEND and TODO_CACHE_LOCATION select a cache shared by all workers, e.g.
+# django.core.cache.backends.memcached.MemcachedCache. The default LocMemCache is private to each process.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('TODO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('TODO_CACHE_LOCATION', ''),
+    }
+}
+
+# Whether all processes see the same cache. Sessions and session users are only read from a shared
+# cache, a logout or password change would not evict the copy in another worker's private cache.
+# TODO_SHARED_CACHE=1 also allows them with LocMemCache under a single process server.
+TODO_SHARED_CACHE = os.environ.get(
+    'TODO_SHARED_CACHE', '0' if CACHES['default']['BACKEND'].endswith(('.LocMemCache', '.DummyCache')) else '1'
+) == '1'
+
+# Seconds the assembled current/completed lists of a user are kept in the cache
+TODO_LIST_CACHE_TIMEOUT = 300
+
+# Without TODO_SHARED_CACHE the lists, invite and todo counts are only kept this many seconds, the
+# cache of the other workers misses the invalidations of a write
+TODO_PRIVATE_CACHE_TIMEOUT = 5
+
+# Seconds a rendered todo row is kept in the cache, rows are keyed by the todo version
+TODO_ROW_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Server-Sent Events of group todos: seconds between heartbeats, seconds before a stream is closed
+# (the browser reconnects and resumes), number of events kept for resuming and seconds between
+# checks of the event table for events of other processes. Every open stream holds a server thread
+# for up to TODO_EVENTS_STREAM_TIMEOUT seconds: run a threaded server (e.g. gunicorn --threads) with
+# a thread per expected client on top of the request threads.
+TODO_EVENTS_HEARTBEAT = 15
+TODO_EVENTS_STREAM_TIMEOUT = 300
+TODO_EVENTS_HISTORY = 1000
+TODO_EVENTS_POLL = 1
+
+# Clients allowed to scrape /metrics (None allows everyone)
+TODO_METRICS_ALLOWED_IPS = ['127.0.0.1']
+
+# Requests slower than this many seconds are logged with their SQL by 'todo_app.slow_requests'
+# (None disables the log)
+TODO_SLOW_REQUEST_THRESHOLD = None
+
+# Maximum number of todos created, completed and deleted by one API request
+TODO_API_MAX_BATCH = 1000
+
+# Maximum number of usernames invited to a group by one request
+TODO_MAX_INVITES = 500
+
+# Due date reminders: the send_reminders command mails through EMAIL_BACKEND, links point to TODO_SITE_URL
+EMAIL_BACKEND = 'django.core.mail.backends.' + os.environ.get('TODO_EMAIL_BACKEND', 'console') + '.EmailBackend'
+TODO_SITE_URL = os.environ.get('TODO_SITE_URL', 'http://localhost:8000')
+
+# Rows fetched per query and sent per piece by the export, rows inserted per bulk_create by the import
+TODO_EXPORT_CHUNK_SIZE = 2000
+TODO_IMPORT_BATCH_SIZE = 1000
+
+# Background jobs run by the run_jobs command: a failed job is retried after TODO_JOB_BACKOFF seconds,
+# doubled per attempt, up to TODO_JOB_MAX_ATTEMPTS runs. The worker touches its running jobs every
+# --poll seconds, jobs untouched for TODO_JOB_TIMEOUT seconds are taken for lost and queued again.
+TODO_JOB_BACKOFF = 30
+TODO_JOB_MAX_ATTEMPTS = 3
+TODO_JOB_TIMEOUT = 5 * 60
+
+# Sessions and authentication
+# https://docs.djangoproject.com/en/3.0/topics/http/sessions/#configuring-the-session-engine
+
+# 'db' reads the session table on every request, 'cached_db' reads sessions from the cache and writes
+# them through to the database (needs TODO_SHARED_CACHE), 'signed_cookies' keeps them in the browser
+SESSION_ENGINE = 'django.contrib.sessions.backends.' + os.environ.get('TODO_SESSION_BACKEND', 'db')
+if SESSION_ENGINE.endswith('.cached_db') and not TODO_SHARED_CACHE:
+    raise ImproperlyConfigured('TODO_SESSION_BACKEND=cached_db needs a cache shared by all workers')
+
+# With TODO_SHARED_CACHE the user of a session is loaded from the cache. ModelBackend stays listed,
+# sessions keep the path of the backend that logged them in.
+AUTHENTICATION_BACKENDS = ['todo_app.backends.CachedModelBackend', 'django.contrib.auth.backends.ModelBackend']
+
+# Seconds a session user is kept in the cache
+TODO_USER_CACHE_TIMEOUT = 300
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -118,4 +244,13 @@ STATIC_URL = '/static/'
 
 STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 
+# collectstatic adds content hashes to the file names and writes .gz (and with the brotli package .br)
+# variants, todo_app.static.StaticFilesMiddleware serves them. Third-party CSS and JavaScript are
+# fetched into static/vendor by the vendor_assets command, the pages load them from there only.
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+STATICFILES_STORAGE = 'todo_app.static.CompressedManifestStaticFilesStorage'
+
+# Seconds browsers may cache static files without a content hash in their name
+TODO_STATIC_MAX_AGE = 60
+
 LOGIN_URL = '/login/'
@@ -0,0 +1,16 @@
+"""
+Settings of the test run: ./manage.py test --settings=todolist.test_settings
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES
+
+
+# The replica alias exists in every test run, on a test database of its own that is never written
+# to. The path of a configured replica is never touched.
+DATABASES['replica'] = {
+    **DATABASES.get('replica', {'ENGINE': 'django.db.backends.sqlite3',
+                                'NAME': os.path.join(BASE_DIR, 'replica.sqlite3')}),
+    'TEST': {'NAME': os.path.join(BASE_DIR, 'test_replica.sqlite3')},
+}
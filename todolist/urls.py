@@ -13,13 +13,19 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import django
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path
-from todo_app import views
+from todo_app import views, api, async_views
+
+# Async read views need Django 3.1+, todolist/asgi.py switches them on
+read_views = async_views if settings.TODO_ASYNC_VIEWS and django.VERSION >= (3, 1) else views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', views.home, name='home'),
+    path('metrics', views.metrics, name='metrics'),
 
     # Auth
 
@@ -29,19 +35,28 @@ urlpatterns = [
 
     # Todolist
 
-    path('current/', views.current_todos, name='current_todos'),
-    path('completed/', views.completed_todos, name='completed_todos'),
+    path('current/', read_views.current_todos, name='current_todos'),
+    path('completed/', read_views.completed_todos, name='completed_todos'),
     path('create/', views.create_todo, name='create_todo'),
     path('todo/<int:todo_pk>/edit/', views.edit_todo, name='edit_todo'),
     path('todo/<int:todo_pk>/complete/', views.complete_todo, name='complete_todo'),
     path('todo/<int:todo_pk>/delete/', views.delete_todo, name='delete_todo'),
-    path('todo/<int:todo_pk>/', views.view_todo, name='view_todo'),
+    path('todo/<int:todo_pk>/', read_views.view_todo, name='view_todo'),
+    path('events/', views.todo_events, name='todo_events'),
+    path('search/', views.search, name='search'),
+    path('export/', views.export_todos, name='export_todos'),
+    path('import/', views.import_todos_view, name='import_todos'),
 
 
     # Groups
 
-    path('groups/', views.groups, name='groups'),
+    path('groups/', read_views.groups, name='groups'),
     path('groups/create/', views.create_group, name='create_group'),
-    path('groups/<int:group_id>/', views.group, name='group'),
+    path('groups/<int:group_id>/', read_views.group, name='group'),
+    path('groups/<int:group_id>/events/', views.group_events, name='group_events'),
     path('groups/accept/', views.group_accept, name='group_accept'),
+
+    # API
+
+    path('api/todos/bulk/', api.bulk_todos, name='api_bulk_todos'),
 ]